@@ -0,0 +1,79 @@
+"""
+Copyright (C) 2025  Brenno Flávio de Almeida
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; version 3.
+
+sealed is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+Serializing a vault-sized item list for QML with to_qml against the
+asdict() + enum_to_str() pass it replaced. Run from the repository root:
+
+    python -m benchmarks.bench_to_qml
+"""
+
+import timeit
+from dataclasses import asdict, dataclass
+from typing import List
+
+from src.bitwarden_client import BitwardenField, BitwardenItem, BitwardenItemType
+from src.ut_components.utils import enum_to_str, to_qml
+
+ITEMS = 2000
+NUMBER = 20
+
+
+@dataclass
+class ItemsResponse:
+    success: bool
+    items: List[BitwardenItem]
+
+
+def make_item(index: int) -> BitwardenItem:
+    return BitwardenItem(
+        id=f"item-{index}",
+        name=f"Item {index}",
+        username="alice@example.com",
+        password="correct horse battery staple",
+        totp="",
+        notes="",
+        creation_date="2025-01-01T00:00:00.000Z",
+        revision_date="2025-01-01T00:00:00.000Z",
+        favorite=index % 10 == 0,
+        item_type=BitwardenItemType.LOGIN,
+        cardholder_name="",
+        brand="",
+        number="",
+        expiry_month="",
+        expiry_year="",
+        code="",
+        raw={"id": f"item-{index}", "type": 1, "login": {"uris": [{"uri": "https://example.com"}]}},
+        folder_id="",
+        folder_name="",
+        fields=[BitwardenField(name="pin", value="1234", type=1)],
+    )
+
+
+def per_call_ms(func) -> float:
+    return timeit.timeit(func, number=NUMBER) / NUMBER * 1e3
+
+
+def main() -> None:
+    response = ItemsResponse(success=True, items=[make_item(index) for index in range(ITEMS)])
+    expected = enum_to_str(asdict(response))
+    assert to_qml(response) == expected
+    assert type(to_qml(response)["items"][0]["item_type"]) is str
+    print(f"{ITEMS} items with one custom field each")
+    print(f"asdict + enum_to_str  {per_call_ms(lambda: enum_to_str(asdict(response))):6.1f} ms")
+    print(f"to_qml                {per_call_ms(lambda: to_qml(response)):6.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Copyright (C) 2025  Brenno Flávio de Almeida
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; version 3.
+
+sealed is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+Throughput of the TOTP engine against the uncached implementation it
+replaced. Run from the repository root:
+
+    python -m benchmarks.bench_totp
+"""
+
+import base64
+import hashlib
+import hmac
+import struct
+import time
+import timeit
+
+from src.totp import generate_codes, get_totp_state, get_totp_window, parse_totp_secret
+
+SECRET = "JBSWY3DPEHPK3PXP"
+URI = f"otpauth://totp/Example:alice?secret={SECRET}&issuer=Example"
+NUMBER = 20000
+
+
+def uncached_totp_state(secret, time_step=30, digits=6, digest=hashlib.sha1):
+    # decodes the secret and keys a new HMAC on every call
+    secret = secret.replace(" ", "").replace("-", "").upper()
+    padding = 8 - len(secret) % 8
+    if padding != 8:
+        secret += "=" * padding
+    secret_bytes = base64.b32decode(secret)
+    current_time = int(time.time())
+    counter = current_time // time_step
+    hmac_digest = hmac.new(secret_bytes, struct.pack(">Q", counter), digest).digest()
+    offset = hmac_digest[-1] & 0x0F
+    code = struct.unpack(">I", hmac_digest[offset : offset + 4])[0] & 0x7FFFFFFF
+    return str(code % (10**digits)).zfill(digits), time_step - (current_time % time_step)
+
+
+def per_call_us(func, number=NUMBER):
+    return timeit.timeit(func, number=number) / number * 1e6
+
+
+def main():
+    assert uncached_totp_state(SECRET)[0] == get_totp_state(SECRET)[0]
+    params = parse_totp_secret(SECRET)
+    print(f"uncached get_totp_state  {per_call_us(lambda: uncached_totp_state(SECRET)):8.2f} us")
+    print(f"get_totp_state           {per_call_us(lambda: get_totp_state(SECRET)):8.2f} us")
+    print(f"get_totp_window (URI)    {per_call_us(lambda: get_totp_window(URI)):8.2f} us")
+    per_run = per_call_us(lambda: generate_codes(params, 0, 1000), number=20)
+    print(f"generate_codes           {per_run / 1000:8.2f} us per code")
+
+
+if __name__ == "__main__":
+    main()
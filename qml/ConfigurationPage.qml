@@ -1,3 +1,4 @@
+import "." 1.0
 import Lomiri.Components 1.3
 /*
  * Copyright (C) 2025  Brenno Flávio de Almeida
@@ -24,6 +25,7 @@ Page {
 
     property bool crashReportEnabled: false
     property string serverUrl: ""
+    property bool pinEnabled: false
 
     function loadConfiguration() {
         python.call('main.get_configuration', [], function(config) {
@@ -31,6 +33,9 @@ Page {
                 if (config.hasOwnProperty('crash_logs'))
                     configurationPage.crashReportEnabled = config.crash_logs;
 
+                if (config.hasOwnProperty('pin_enabled'))
+                    configurationPage.pinEnabled = config.pin_enabled;
+
                 if (config.hasOwnProperty('server_url')) {
                     configurationPage.serverUrl = config.server_url;
                     serverUrlField.text = config.server_url;
@@ -54,6 +59,27 @@ Page {
         });
     }
 
+    function setPin() {
+        pinErrorLabel.text = "";
+        python.call('main.set_pin', [SessionModel.getEncryptionKey(), pinInputField.text], function(response) {
+            if (response.success) {
+                pinInputField.text = "";
+                configurationPage.pinEnabled = true;
+            } else {
+                pinErrorLabel.text = response.message;
+            }
+        });
+    }
+
+    function removePin() {
+        pinErrorLabel.text = "";
+        python.call('main.remove_pin', [], function(response) {
+            if (response.success)
+                configurationPage.pinEnabled = false;
+
+        });
+    }
+
     function logout() {
         logoutErrorLabel.text = "";
         loadToast.message = i18n.tr("Logging out...");
@@ -129,6 +155,42 @@ Page {
 
             }
 
+            ConfigurationGroup {
+                width: parent.width
+                title: i18n.tr("Quick Unlock")
+
+                InputField {
+                    id: pinInputField
+
+                    width: parent.width
+                    visible: !configurationPage.pinEnabled
+                    title: i18n.tr("PIN")
+                    placeholder: i18n.tr("Unlock with a PIN until the device restarts")
+                    echoMode: TextInput.Password
+                }
+
+                ActionButton {
+                    text: configurationPage.pinEnabled ? i18n.tr("Disable PIN Unlock") : i18n.tr("Enable PIN Unlock")
+                    color: configurationPage.pinEnabled ? theme.palette.normal.negative : theme.palette.normal.positive
+                    onClicked: configurationPage.pinEnabled ? configurationPage.removePin() : configurationPage.setPin()
+                    anchors.horizontalCenter: parent.horizontalCenter
+                    width: parent.width - units.gu(4)
+                    iconName: "lock"
+                }
+
+                Label {
+                    id: pinErrorLabel
+
+                    width: parent.width - units.gu(4)
+                    anchors.horizontalCenter: parent.horizontalCenter
+                    text: ""
+                    color: theme.palette.normal.negative
+                    wrapMode: Text.WordWrap
+                    visible: text !== ""
+                }
+
+            }
+
             ConfigurationGroup {
                 width: parent.width
                 title: i18n.tr("Account")
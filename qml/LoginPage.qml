@@ -27,7 +27,9 @@ Page {
     property string email: ""
     property string password: ""
     property string totp: ""
+    property string pin: ""
     property bool isLoggingIn: false
+    property int unlockProgress: 0
     property string loginMessage: ""
     property bool loginSuccess: false
     property var loginScreenData: null
@@ -52,11 +54,13 @@ Page {
 
     function performLogin() {
         isLoggingIn = true;
+        unlockProgress = 0;
         loginMessage = "";
         var emailValue = visibleFields.indexOf("email") !== -1 ? email : "";
         var passwordValue = visibleFields.indexOf("password") !== -1 ? password : "";
         var totpValue = visibleFields.indexOf("totp") !== -1 ? totp : "";
-        python.call('main.login', [emailValue, passwordValue, totpValue], function(result) {
+        var pinValue = visibleFields.indexOf("pin") !== -1 ? pin : "";
+        python.call('main.login', [emailValue, passwordValue, totpValue, pinValue], function(result) {
             isLoggingIn = false;
             if (result && result.success) {
                 loginSuccess = true;
@@ -66,6 +70,10 @@ Page {
             } else {
                 loginSuccess = false;
                 loginMessage = result && result.message ? result.message : i18n.tr("Login failed");
+                if (pinValue && !passwordValue) {
+                    pin = "";
+                    checkLoginScreen();
+                }
             }
         });
     }
@@ -126,10 +134,23 @@ Page {
                     onTextChanged: loginPage.email = text
                 }
 
+                InputField {
+                    id: pinField
+
+                    property bool isValid: true
+
+                    visible: loginPage.visibleFields.indexOf("pin") !== -1
+                    title: i18n.tr("PIN")
+                    placeholder: i18n.tr("Enter your PIN or use your password below")
+                    text: loginPage.pin
+                    echoMode: TextInput.Password
+                    onTextChanged: loginPage.pin = text
+                }
+
                 InputField {
                     id: passwordField
 
-                    property bool isValid: loginPage.visibleFields.indexOf("password") === -1 || text.trim() !== ""
+                    property bool isValid: loginPage.visibleFields.indexOf("password") === -1 || text.trim() !== "" || (pinField.visible && loginPage.pin !== "")
 
                     visible: loginPage.visibleFields.indexOf("password") !== -1
                     title: i18n.tr("Password")
@@ -177,7 +198,7 @@ Page {
         id: loginLoadingToast
 
         showing: loginPage.isLoggingIn
-        message: i18n.tr("Logging in... This may take a few moments")
+        message: loginPage.unlockProgress > 0 ? i18n.tr("Logging in... %1%").arg(loginPage.unlockProgress) : i18n.tr("Logging in... This may take a few moments")
     }
 
     LoadToast {
@@ -194,6 +215,9 @@ Page {
             addImportPath(Qt.resolvedUrl('../src/'));
             importModule('main', function() {
             });
+            setHandler('unlock-progress', function(progress) {
+                loginPage.unlockProgress = Math.round(progress * 100);
+            });
         }
         onError: {
         }
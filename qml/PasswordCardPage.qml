@@ -44,6 +44,30 @@ Page {
 
     signal backRequested()
 
+    function loadItem() {
+        python.call('main.get_item', [SessionModel.getEncryptionKey(), cardId], function(result) {
+            if (!result.success) {
+                toast.show(i18n.tr("Failed to load item"));
+                return ;
+            }
+            var item = result.item;
+            name = item.name || "";
+            cardholderName = item.cardholder_name || "";
+            brand = item.brand || "";
+            number = item.number || "";
+            expiryMonth = item.expiry_month || "";
+            expiryYear = item.expiry_year || "";
+            code = item.code || "";
+            notes = item.notes || "";
+            created = item.created || "";
+            updated = item.updated || "";
+            favorite = item.favorite || false;
+            folderId = item.folder_id || "";
+            folderName = item.folder_name || "";
+            fields = item.fields || [];
+        });
+    }
+
     function copyToClipboard(text, itemName) {
         Clipboard.push(text);
         toast.show(i18n.tr("%1 copied to clipboard").arg(itemName));
@@ -256,6 +280,7 @@ Page {
         Component.onCompleted: {
             addImportPath(Qt.resolvedUrl('../src/'));
             importModule('main', function() {
+                passwordCardPage.loadItem();
             });
         }
         onError: {
@@ -39,7 +39,10 @@ Page {
     property string folderName: ""
     property var fields: []
     property string currentTotpCode: ""
+    property string nextTotpCode: ""
     property int currentTotpSecondsRemaining: 0
+    property int totpPeriod: 30
+    property string totpSubscriptionId: ""
     property bool totpLoaded: false
     property bool pythonReady: false
 
@@ -50,35 +53,77 @@ Page {
         toast.show(i18n.tr("%1 copied to clipboard").arg(itemName));
     }
 
+    function loadItem() {
+        python.call('main.get_item', [SessionModel.getEncryptionKey(), loginId], function(result) {
+            if (!result.success) {
+                toast.show(i18n.tr("Failed to load item"));
+                return ;
+            }
+            var item = result.item;
+            name = item.name || "";
+            username = item.username || "";
+            password = item.password || "";
+            notes = item.notes || "";
+            created = item.created || "";
+            updated = item.updated || "";
+            favorite = item.favorite || false;
+            folderId = item.folder_id || "";
+            folderName = item.folder_name || "";
+            fields = item.fields || [];
+            totpSecret = item.totp || "";
+        });
+    }
+
     function resetTotpState() {
         currentTotpCode = "";
+        nextTotpCode = "";
         currentTotpSecondsRemaining = 0;
         totpLoaded = false;
         totpVisible = false;
     }
 
-    function refreshTotp(copyAfterRefresh) {
+    function applyTotpWindow(totpWindow) {
+        currentTotpCode = totpWindow && totpWindow.code ? totpWindow.code : "";
+        nextTotpCode = totpWindow && totpWindow.next_code ? totpWindow.next_code : "";
+        currentTotpSecondsRemaining = totpWindow && totpWindow.seconds_remaining ? totpWindow.seconds_remaining : 0;
+        totpPeriod = totpWindow && totpWindow.period ? totpWindow.period : 30;
+        totpLoaded = true;
+    }
+
+    function unsubscribeTotp() {
+        if (totpSubscriptionId === "")
+            return ;
+
+        python.call('main.unsubscribe_totp', [totpSubscriptionId], function() {
+        });
+        totpSubscriptionId = "";
+    }
+
+    function subscribeTotp() {
+        unsubscribeTotp();
         var requestedSecret = totpSecret;
         if (requestedSecret === "") {
             resetTotpState();
             return ;
         }
-        python.call('main.get_totp', [requestedSecret], function(result) {
-            if (requestedSecret !== passwordLoginPage.totpSecret)
+        python.call('main.subscribe_totp', [requestedSecret], function(result) {
+            if (requestedSecret !== passwordLoginPage.totpSecret || !passwordLoginPage.visible) {
+                python.call('main.unsubscribe_totp', [result.subscription_id], function() {
+                });
                 return ;
-
-            currentTotpCode = result && result.code ? result.code : "";
-            currentTotpSecondsRemaining = result && result.seconds_remaining ? result.seconds_remaining : 0;
-            totpLoaded = true;
-            if (copyAfterRefresh) {
-                if (currentTotpCode !== "")
-                    copyToClipboard(currentTotpCode, i18n.tr("TOTP Code"));
-                else
-                    toast.show(i18n.tr("TOTP unavailable"));
             }
+            totpSubscriptionId = result.subscription_id;
+            applyTotpWindow(result.totp);
         });
     }
 
+    function copyTotp() {
+        if (totpLoaded && currentTotpCode !== "")
+            copyToClipboard(currentTotpCode, i18n.tr("TOTP Code"));
+        else
+            toast.show(i18n.tr("TOTP unavailable"));
+    }
+
     function totpTitle() {
         if (!totpLoaded)
             return i18n.tr("TOTP - Loading...");
@@ -101,10 +146,20 @@ Page {
 
     onTotpSecretChanged: {
         resetTotpState();
-        if (pythonReady && visible && totpSecret !== "")
-            refreshTotp();
+        if (pythonReady && visible)
+            subscribeTotp();
+
+    }
+    onVisibleChanged: {
+        if (!pythonReady)
+            return ;
 
+        if (visible)
+            subscribeTotp();
+        else
+            unsubscribeTotp();
     }
+    Component.onDestruction: unsubscribeTotp()
 
     Flickable {
         contentHeight: contentColumn.height + units.gu(4)
@@ -175,7 +230,7 @@ Page {
                     showVisibilityToggle: totpLoaded && currentTotpCode !== ""
                     isContentVisible: passwordLoginPage.totpVisible
                     onVisibilityToggled: passwordLoginPage.totpVisible = !passwordLoginPage.totpVisible
-                    onCopyClicked: passwordLoginPage.refreshTotp(true)
+                    onCopyClicked: passwordLoginPage.copyTotp()
                 }
 
             }
@@ -217,18 +272,17 @@ Page {
     Timer {
         interval: 1000
         repeat: true
-        running: passwordLoginPage.pythonReady && passwordLoginPage.visible && passwordLoginPage.totpSecret !== ""
-        triggeredOnStart: true
+        running: passwordLoginPage.totpLoaded && passwordLoginPage.visible && passwordLoginPage.currentTotpCode !== ""
         onTriggered: {
-            if (!passwordLoginPage.totpLoaded) {
-                passwordLoginPage.refreshTotp();
-                return ;
-            }
             if (passwordLoginPage.currentTotpSecondsRemaining > 1) {
                 passwordLoginPage.currentTotpSecondsRemaining -= 1;
                 return ;
             }
-            passwordLoginPage.refreshTotp();
+            if (passwordLoginPage.nextTotpCode !== "") {
+                passwordLoginPage.currentTotpCode = passwordLoginPage.nextTotpCode;
+                passwordLoginPage.nextTotpCode = "";
+                passwordLoginPage.currentTotpSecondsRemaining = passwordLoginPage.totpPeriod;
+            }
         }
     }
 
@@ -310,7 +364,20 @@ Page {
         Component.onCompleted: {
             addImportPath(Qt.resolvedUrl('../src/'));
             importModule('main', function() {
+                setHandler('totp', function(result) {
+                    if (!result || !result.items || passwordLoginPage.totpSubscriptionId === "")
+                        return ;
+
+                    for (var i = 0; i < result.items.length; i++) {
+                        if (result.items[i].secret === passwordLoginPage.totpSecret) {
+                            passwordLoginPage.applyTotpWindow(result.items[i]);
+                            return ;
+                        }
+                    }
+                });
                 passwordLoginPage.pythonReady = true;
+                passwordLoginPage.loadItem();
+
             });
         }
         onError: {
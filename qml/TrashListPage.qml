@@ -26,6 +26,10 @@ Page {
 
     property var passwords: []
     property bool hasLoaded: false
+    // items matching the search field, or null when it is empty
+    property var searchResults: null
+    // replies to searches older than the latest one are ignored
+    property int searchGeneration: 0
 
     signal passwordSelected(string passwordId, string passwordName)
     signal backRequested()
@@ -41,6 +45,23 @@ Page {
         });
     }
 
+    function searchPasswords(text) {
+        var generation = ++searchGeneration;
+        if (text.trim() === "") {
+            searchResults = null;
+            return ;
+        }
+        python.call('main.search_items', [SessionModel.getEncryptionKey(), text, true], function(result) {
+            if (generation !== searchGeneration)
+                return ;
+
+            if (result.success)
+                searchResults = result.items;
+            else
+                toast.show(i18n.tr("Failed to search deleted items"));
+        });
+    }
+
     function copyToClipboard(text, itemName) {
         Clipboard.push(text);
         toast.show(i18n.tr("%1 copied to clipboard").arg(itemName));
@@ -53,7 +74,7 @@ Page {
     ActionableList {
         id: trashList
 
-        items: passwords.map(function(pwd) {
+        items: (searchResults !== null ? searchResults : passwords).map(function(pwd) {
             var icon = "";
             if (pwd.favorite === true) {
                 icon = "starred";
@@ -74,26 +95,15 @@ Page {
                 "subtitle": pwd.username || "",
                 "username": pwd.username,
                 "password": pwd.password,
-                "totpSecret": pwd.totp || "",
-                "notes": pwd.notes || "",
-                "created": pwd.created || "",
-                "updated": pwd.updated || "",
                 "item_type": pwd.item_type || "login",
-                "icon": icon,
-                "cardholderName": pwd.cardholder_name || "",
-                "brand": pwd.brand || "",
-                "number": pwd.number || "",
-                "expiryMonth": pwd.expiry_month || "",
-                "expiryYear": pwd.expiry_year || "",
-                "code": pwd.code || "",
-                "favorite": pwd.favorite || false,
-                "fields": pwd.fields || []
+                "icon": icon
             };
         })
         showSearchBar: true
+        remoteSearch: true
         searchPlaceholder: i18n.tr("Search deleted items...")
-        searchFields: ["title", "subtitle"]
         emptyMessage: hasLoaded ? i18n.tr("No items in trash") : i18n.tr("Loading deleted items...")
+        onSearchRequested: searchPasswords(text)
         itemActions: [{
             "id": "copy-username",
             "iconName": "contact"
@@ -120,33 +130,14 @@ Page {
                 if (itemType === "login")
                     pageStack.push(Qt.resolvedUrl("PasswordLoginPage.qml"), {
                     "loginId": item.id || "",
-                    "name": item.title || "",
-                    "username": item.username || "",
-                    "password": item.password || "",
-                    "totpSecret": item.totpSecret || "",
-                    "notes": item.notes || "",
-                    "created": item.created || "",
-                    "updated": item.updated || "",
-                    "favorite": item.favorite || false,
                     "isTrashed": true,
-                    "fields": item.fields || []
+                    "name": item.title || ""
                 });
                 else if (itemType === "card")
                     pageStack.push(Qt.resolvedUrl("PasswordCardPage.qml"), {
                     "cardId": item.id || "",
-                    "name": item.title || "",
-                    "cardholderName": item.cardholderName || "",
-                    "brand": item.brand || "",
-                    "number": item.number || "",
-                    "expiryMonth": item.expiryMonth || "",
-                    "expiryYear": item.expiryYear || "",
-                    "code": item.code || "",
-                    "notes": item.notes || "",
-                    "created": item.created || "",
-                    "updated": item.updated || "",
-                    "favorite": item.favorite || false,
                     "isTrashed": true,
-                    "fields": item.fields || []
+                    "name": item.title || ""
                 });
             }
         }
@@ -193,6 +184,7 @@ Page {
                 if (result.success) {
                     passwords = result.items;
                     hasLoaded = true;
+                    searchPasswords(trashList.searchText);
                     toast.show(i18n.tr("Trash synced"));
                 } else {
                     toast.show(i18n.tr("Failed to load deleted items"));
@@ -25,7 +25,8 @@ import QtQuick.Layouts 1.3
  * (applied to all items) and per-item custom actions.
  *
  * Features:
- * - Optional search bar with configurable search fields
+ * - Optional search bar with configurable search fields, or search delegated
+ *   to the page through searchRequested when remoteSearch is set
  * - Item display with title, subtitle, and optional icon
  * - Customizable action buttons per item
  * - Empty state message
@@ -59,6 +60,20 @@ import QtQuick.Layouts 1.3
  * }
  * \endqml
  *
+ * Example with search done by the backend:
+ * \qml
+ * ActionableList {
+ *     items: searchResults !== null ? searchResults : allItems
+ *     showSearchBar: true
+ *     remoteSearch: true
+ *     onSearchRequested: {
+ *         python.call('main.search_items', [text], function(result) {
+ *             searchResults = text === "" ? null : result.items;
+ *         });
+ *     }
+ * }
+ * \endqml
+ *
  * Example with per-item custom actions:
  * \qml
  * ActionableList {
@@ -98,6 +113,16 @@ Column {
      * Can be extended to search multiple fields: ["title", "subtitle", "description"]
      */
     property var searchFields: ["title"]
+    /*!
+     * When true the list shows items as given and does not filter them;
+     * searchRequested is emitted once typing pauses so the page can fetch
+     * the matching items itself.
+     */
+    property bool remoteSearch: false
+    //! Milliseconds to wait after the last keystroke before searchRequested
+    property int searchDelay: 250
+    //! Current text of the search field
+    readonly property alias searchText: searchInput.text
     /*!
      * Global actions applied to all items (unless overridden by item.customActions).
      * Each action object should have: id, iconName, text (optional), enabled (optional), visible (optional)
@@ -115,6 +140,8 @@ Column {
      * @param actionData Optional data from item.actionData property
      */
     signal actionTriggered(string actionId, var item, var actionData)
+    //! Emitted with the search text when remoteSearch is set and typing pauses
+    signal searchRequested(string text)
 
     width: parent.width
     spacing: units.gu(1)
@@ -147,12 +174,24 @@ Column {
                 width: parent.width - units.gu(5)
                 anchors.verticalCenter: parent.verticalCenter
                 placeholderText: actionableList.searchPlaceholder
+                onTextChanged: {
+                    if (actionableList.remoteSearch)
+                        searchTimer.restart();
+
+                }
             }
 
         }
 
     }
 
+    Timer {
+        id: searchTimer
+
+        interval: actionableList.searchDelay
+        onTriggered: actionableList.searchRequested(searchInput.text)
+    }
+
     ListView {
         id: listView
 
@@ -162,7 +201,7 @@ Column {
         clip: true
         model: {
             var filtered = items;
-            if (showSearchBar && searchInput.text.length > 0) {
+            if (showSearchBar && !remoteSearch && searchInput.text.length > 0) {
                 var searchText = searchInput.text.toLowerCase();
                 filtered = filtered.filter(function(item) {
                     for (var i = 0; i < searchFields.length; i++) {
@@ -7,75 +7,780 @@ from src.ut_components import setup
 setup(APP_NAME, CRASH_REPORT_URL)
 
 import base64
+import functools
+import hashlib
+import hmac
+import itertools
 import json
 import os
+import struct
+import time
+import zlib
 from base64 import urlsafe_b64decode, urlsafe_b64encode
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeoutError
+from dataclasses import asdict, dataclass
 from importlib.metadata import version
-from typing import Dict, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
-from cryptography.fernet import Fernet
+from cryptography.exceptions import InvalidTag, UnsupportedAlgorithm
+from cryptography.fernet import Fernet, InvalidToken
 from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
 
+from src.ut_components.config import get_runtime_path
 from src.ut_components.kv import KV
+from src.utils import matches_tokens, search_tokens
+
+STORAGE_FORMAT_V2 = b"\x02"
+STORAGE_FORMAT_V3 = b"\x03"
+CODEC_NONE = 0
+CODEC_ZLIB = 1
+STORAGE_FORMAT_V4 = b"\x04"
+COMPRESSION_THRESHOLD = 1024
+COMPRESSION_LEVEL = 6
+STREAM_THRESHOLD = 256 * 1024
+STREAM_CHUNK_SIZE = 64 * 1024
+STREAM_NONCE_PREFIX_SIZE = 7
+STREAM_TAG_SIZE = 16
+STORAGE_FORMAT_V5 = b"\x05"
+STORAGE_FORMAT_V6 = b"\x06"
+AEAD_NONCE_SIZE = 12
+CIPHER_BENCHMARK_SIZE = 64 * 1024
+CIPHER_BENCHMARK_ROUNDS = 8
+SEARCH_MAX_PREFIX = 12
+PIN_FILE = "pin"
+PIN_MAX_ATTEMPTS = 5
+BOOT_ID_PATH = "/proc/sys/kernel/random/boot_id"
+SEARCH_BLIND_SIZE = 6
+
+KDF_VERSION = 1
+KDF_ALGORITHM = "pbkdf2-sha256"
+LEGACY_KDF_ITERATIONS = 480000
+KDF_TARGET_SECONDS = 1.0
+KDF_MIN_ITERATIONS = 100000
+KDF_MAX_ITERATIONS = 2000000
+KDF_CALIBRATION_ITERATIONS = 20000
+KDF_CALIBRATION_ROUNDS = 3
+# The PIN wrap is guarded by the 0600 tmpfs file, the boot id and the attempt
+# counter; its KDF only has to make the wrap itself costly to brute force, so
+# it targets a short unlock instead of the password's full second.
+KDF_PIN_TARGET_SECONDS = 0.08
+KDF_PIN_MIN_ITERATIONS = 10000
+PROGRESS_INTERVAL_SECONDS = 0.25
+
+# Resolved once: importlib.metadata scans site-packages on every call.
+CRYPTOGRAPHY_VERSION = tuple(int(x) for x in version("cryptography").split(".")[:2] if x.isdigit())
+if CRYPTOGRAPHY_VERSION < (3, 2):
+    from cryptography.hazmat.backends import default_backend
+
+    KDF_BACKEND_KWARGS: Dict = {"backend": default_backend()}
+else:
+    KDF_BACKEND_KWARGS = {}
+
+KDF_EXECUTOR = ThreadPoolExecutor(max_workers=1, thread_name_prefix="kdf")
+
+
+@dataclass
+class KdfParams:
+    version: int
+    algorithm: str
+    iterations: int
+    seconds: Optional[float] = None
+
+
+# Devices that unlocked before calibration existed have a salt but no header.
+LEGACY_KDF_PARAMS = KdfParams(version=0, algorithm=KDF_ALGORITHM, iterations=LEGACY_KDF_ITERATIONS)
+
+
+@dataclass(frozen=True)
+class CipherSuite:
+    tag: int
+    name: str
+    factory: Callable[[bytes], Any]
+
+
+# The tag byte is written next to the format byte of every v5/v6 value, so
+# tags must never be reused. Fernet (v1-v3) and the v4 stream stay readable.
+CIPHER_SUITES = {
+    1: CipherSuite(tag=1, name="aes-256-gcm", factory=AESGCM),
+    2: CipherSuite(tag=2, name="chacha20-poly1305", factory=ChaCha20Poly1305),
+}
+DEFAULT_CIPHER_SUITE = CIPHER_SUITES[1]
+CIPHER_SUITE: Optional[CipherSuite] = None
+
+# Random per-process key used to fingerprint the password of the unlocked
+# session, so the cache below never holds the password or a plain hash of it.
+_VERIFIER_KEY = os.urandom(32)
+# (fingerprint of salt + kdf params + password, encryption key) of the last derived key
+DERIVED_KEY: Optional[Tuple[bytes, str]] = None
+KDF_STATE: Optional[Tuple[bytes, KdfParams]] = None
 
 
 def generate_salt(length: int = 16) -> bytes:
     return os.urandom(length)
 
 
-def generate_key_from_password(
-    password: str,
-) -> str:
+def _fingerprint(salt: bytes, params: KdfParams, password_bytes: bytes) -> bytes:
+    message = b"%s:%d:%s" % (params.algorithm.encode("utf-8"), params.iterations, salt)
+    return hmac.new(_VERIFIER_KEY, message + password_bytes, hashlib.sha256).digest()
+
+
+def clear_key_cache() -> None:
+    global DERIVED_KEY, KDF_STATE
+    DERIVED_KEY = None
+    KDF_STATE = None
+    # these hold the vault key and keys derived from it
+    for cached in (_fernet, _stream_cipher, _aead, _search_key, _digest_key):
+        cached.cache_clear()
+
+
+def _derive(password_bytes: bytes, salt: bytes, params: KdfParams) -> bytes:
+    if params.algorithm != KDF_ALGORITHM:
+        raise ValueError(f"unsupported kdf algorithm {params.algorithm}")
+    kdf = PBKDF2HMAC(
+        algorithm=hashes.SHA256(),
+        length=32,
+        salt=salt,
+        iterations=params.iterations,
+        **KDF_BACKEND_KWARGS,
+    )
+    return kdf.derive(password_bytes)
+
+
+def calibrate_kdf(target_seconds: float = KDF_TARGET_SECONDS, min_iterations: int = KDF_MIN_ITERATIONS) -> KdfParams:
+    sample = KdfParams(version=KDF_VERSION, algorithm=KDF_ALGORITHM, iterations=KDF_CALIBRATION_ITERATIONS)
+    salt = generate_salt()
+    best = None
+    for _ in range(KDF_CALIBRATION_ROUNDS):
+        started = time.perf_counter()
+        _derive(b"calibration", salt, sample)
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+
+    seconds_per_iteration = max(best or 0.0, 1e-9) / KDF_CALIBRATION_ITERATIONS
+    iterations = int(target_seconds / seconds_per_iteration) // 1000 * 1000
+    iterations = max(min_iterations, min(KDF_MAX_ITERATIONS, iterations))
+    return KdfParams(
+        version=KDF_VERSION,
+        algorithm=KDF_ALGORITHM,
+        iterations=iterations,
+        seconds=iterations * seconds_per_iteration,
+    )
+
+
+def get_kdf_state() -> Tuple[bytes, KdfParams]:
+    global KDF_STATE
+    if KDF_STATE is not None:
+        return KDF_STATE
+
     with KV() as kv:
         salt_str = kv.get("encryption.salt")
+        header = kv.get("encryption.kdf")
         if not salt_str:
-            salt = os.urandom(16)
-            kv.put("encryption.salt", urlsafe_b64encode(salt).decode("utf-8"))
+            salt = generate_salt()
+            params = calibrate_kdf()
+            kv.put_cached("encryption.salt", urlsafe_b64encode(salt).decode("utf-8"))
+            kv.put_cached("encryption.kdf", asdict(params))
+            kv.commit_cached()
         else:
             salt = urlsafe_b64decode(salt_str)
-        iterations = 480000
-        password_bytes = password.encode("utf-8")
-        kdf_kwargs = {
-            "algorithm": hashes.SHA256(),
-            "length": 32,
-            "salt": salt,
-            "iterations": iterations,
-        }
-        if tuple(version("cryptography").split(".")) < ("3", "2", "0"):
-            from cryptography.hazmat.backends import default_backend
-            kdf_kwargs["backend"] = default_backend()
-        kdf = PBKDF2HMAC(**kdf_kwargs)
-        key = base64.urlsafe_b64encode(kdf.derive(password_bytes))
-        return urlsafe_b64encode(key).decode("utf-8")
+            params = KdfParams(**header) if header else LEGACY_KDF_PARAMS
+    KDF_STATE = (salt, params)
+    return KDF_STATE
+
+
+def kdf_needs_upgrade() -> bool:
+    _, params = get_kdf_state()
+    return params.version < KDF_VERSION
+
+
+def _derive_in_worker(
+    password_bytes: bytes,
+    salt: bytes,
+    params: KdfParams,
+    progress: Optional[Callable[[float], None]],
+) -> bytes:
+    future = KDF_EXECUTOR.submit(_derive, password_bytes, salt, params)
+    started = time.monotonic()
+    while True:
+        try:
+            return future.result(timeout=PROGRESS_INTERVAL_SECONDS)
+        except FutureTimeoutError:
+            if progress and params.seconds:
+                progress(min(0.99, (time.monotonic() - started) / params.seconds))
+
+
+def _derive_key(
+    password: str,
+    salt: bytes,
+    params: KdfParams,
+    progress: Optional[Callable[[float], None]],
+) -> str:
+    global DERIVED_KEY
+    password_bytes = password.encode("utf-8")
+
+    fingerprint = _fingerprint(salt, params, password_bytes)
+    cached = DERIVED_KEY
+    if cached and hmac.compare_digest(cached[0], fingerprint):
+        return cached[1]
+
+    derived = _derive_in_worker(password_bytes, salt, params, progress)
+    if progress:
+        progress(1.0)
+
+    key = base64.urlsafe_b64encode(derived)
+    encryption_key = urlsafe_b64encode(key).decode("utf-8")
+    DERIVED_KEY = (fingerprint, encryption_key)
+    return encryption_key
+
+
+def generate_key_from_password(
+    password: str,
+    progress: Optional[Callable[[float], None]] = None,
+) -> str:
+    salt, params = get_kdf_state()
+    return _derive_key(password, salt, params, progress)
+
+
+def upgrade_kdf(
+    password: str,
+    encryption_key: str,
+    prefixes: List[str],
+    progress: Optional[Callable[[float], None]] = None,
+) -> str:
+    global KDF_STATE
+    salt, _ = get_kdf_state()
+    params = calibrate_kdf()
+    new_encryption_key = _derive_key(password, salt, params, progress)
+
+    old_key = urlsafe_b64decode(encryption_key)
+    new_key = urlsafe_b64decode(new_encryption_key)
+    stale_search_indexes = []
+    with KV() as kv:
+        for prefix in prefixes:
+            for value_key, stored in kv.get_partial(prefix):
+                if value_key.endswith(".search"):
+                    # blinded with the old key; rebuilt on the next save
+                    stale_search_indexes.append(value_key)
+                    continue
+                try:
+                    decrypted_value = _open(old_key, stored)
+                except (InvalidToken, TypeError, ValueError):
+                    continue
+                kv.put_cached(value_key, _seal(new_key, decrypted_value))
+        kv.put_cached("encryption.kdf", asdict(params))
+        kv.commit_cached()
+        for value_key in stale_search_indexes:
+            kv.delete(value_key)
+
+    KDF_STATE = (salt, params)
+    # the PIN wraps the old key
+    disable_pin()
+    return new_encryption_key
+
+
+@functools.lru_cache(maxsize=4)
+def _fernet(key: bytes) -> Fernet:
+    return Fernet(key)
 
 
 def encrypt(key: bytes, data: str) -> bytes:
-    fernet = Fernet(key)
+    fernet = _fernet(key)
     data_bytes = data.encode("utf-8")
     encrypted_data = fernet.encrypt(data_bytes)
     return encrypted_data
 
 
 def decrypt(key: bytes, encrypted_data: bytes) -> str:
-    fernet = Fernet(key)
+    fernet = _fernet(key)
     decrypted_bytes = fernet.decrypt(encrypted_data)
     decrypted_string = decrypted_bytes.decode("utf-8")
     return decrypted_string
 
 
+def _compress(data: bytes) -> bytes:
+    if len(data) >= COMPRESSION_THRESHOLD:
+        compressed = zlib.compress(data, COMPRESSION_LEVEL)
+        if len(compressed) < len(data):
+            return bytes((CODEC_ZLIB,)) + compressed
+    return bytes((CODEC_NONE,)) + data
+
+
+def _decompress(data: bytes) -> bytes:
+    codec, payload = data[0], data[1:]
+    if codec == CODEC_NONE:
+        return payload
+    elif codec == CODEC_ZLIB:
+        return zlib.decompress(payload)
+    raise ValueError(f"unknown codec {codec}")
+
+
+@functools.lru_cache(maxsize=4)
+def _stream_cipher(key: bytes) -> AESGCM:
+    return AESGCM(hmac.new(key, b"sealed.stream.v1", hashlib.sha256).digest())
+
+
+@functools.lru_cache(maxsize=8)
+def _aead(key: bytes, tag: int, purpose: bytes) -> Any:
+    # Each suite and purpose gets its own subkey, so a nonce can never be
+    # reused across algorithms or between single-shot values and streams.
+    suite = CIPHER_SUITES.get(tag)
+    if suite is None:
+        raise InvalidToken
+    label = b"sealed.%s.%s.v1" % (purpose, suite.name.encode("utf-8"))
+    return suite.factory(hmac.new(key, label, hashlib.sha256).digest())
+
+
+def benchmark_cipher_suites(
+    size: int = CIPHER_BENCHMARK_SIZE,
+    rounds: int = CIPHER_BENCHMARK_ROUNDS,
+) -> Dict[str, float]:
+    # MB/s of an encrypt + decrypt round trip. Suites the local OpenSSL
+    # does not provide are left out.
+    data = os.urandom(size)
+    nonce = os.urandom(AEAD_NONCE_SIZE)
+    results = {}
+    for suite in CIPHER_SUITES.values():
+        try:
+            cipher = suite.factory(os.urandom(32))
+            cipher.decrypt(nonce, cipher.encrypt(nonce, data, None), None)
+        except UnsupportedAlgorithm:
+            continue
+        best = None
+        for _ in range(rounds):
+            started = time.perf_counter()
+            cipher.decrypt(nonce, cipher.encrypt(nonce, data, None), None)
+            elapsed = time.perf_counter() - started
+            best = elapsed if best is None else min(best, elapsed)
+        results[suite.name] = round(2 * size / max(best or 0.0, 1e-9) / 1e6, 1)
+    return results
+
+
+def get_cipher_suite() -> CipherSuite:
+    global CIPHER_SUITE
+    if CIPHER_SUITE is not None:
+        return CIPHER_SUITE
+
+    suites = {suite.name: suite for suite in CIPHER_SUITES.values()}
+    with KV() as kv:
+        header = kv.get("encryption.cipher")
+        if not header or header.get("suite") not in suites:
+            results = benchmark_cipher_suites()
+            fastest = max(results, key=results.get) if results else DEFAULT_CIPHER_SUITE.name
+            header = {"suite": fastest, "throughput": results}
+            kv.put("encryption.cipher", header)
+    CIPHER_SUITE = suites[header["suite"]]
+    return CIPHER_SUITE
+
+
+def _stream_nonce(prefix: bytes, counter: int, last: bool) -> bytes:
+    return prefix + struct.pack(">I", counter) + (b"\x01" if last else b"\x00")
+
+
+def _rechunk(pieces: Iterable[bytes], compress: bool) -> Iterator[bytes]:
+    compressor = zlib.compressobj(COMPRESSION_LEVEL) if compress else None
+    buffer = bytearray()
+    for piece in pieces:
+        buffer += compressor.compress(piece) if compressor else piece
+        while len(buffer) >= STREAM_CHUNK_SIZE:
+            yield bytes(buffer[:STREAM_CHUNK_SIZE])
+            del buffer[:STREAM_CHUNK_SIZE]
+    if compressor:
+        buffer += compressor.flush()
+    while len(buffer) > STREAM_CHUNK_SIZE:
+        yield bytes(buffer[:STREAM_CHUNK_SIZE])
+        del buffer[:STREAM_CHUNK_SIZE]
+    yield bytes(buffer)
+
+
+def encrypt_stream(key: bytes, pieces: Iterable[bytes], compress: bool = True) -> Iterator[bytes]:
+    # v6: chunked AEAD (STREAM construction) with the device's cipher suite.
+    # The header is authenticated with every chunk, and each nonce carries the
+    # chunk counter and a last-chunk flag, so reordered, dropped or truncated
+    # chunks fail to decrypt.
+    suite = get_cipher_suite()
+    cipher = _aead(key, suite.tag, b"stream")
+    prefix = os.urandom(STREAM_NONCE_PREFIX_SIZE)
+    codec = CODEC_ZLIB if compress else CODEC_NONE
+    header = STORAGE_FORMAT_V6 + bytes((suite.tag, codec)) + struct.pack(">I", STREAM_CHUNK_SIZE) + prefix
+    yield header
+
+    counter = 0
+    chunks = _rechunk(pieces, compress)
+    chunk = next(chunks)
+    for next_chunk in chunks:
+        yield cipher.encrypt(_stream_nonce(prefix, counter, False), chunk, header)
+        chunk = next_chunk
+        counter += 1
+    yield cipher.encrypt(_stream_nonce(prefix, counter, True), chunk, header)
+
+
+def decrypt_stream(key: bytes, stored: bytes) -> Iterator[bytes]:
+    view = memoryview(stored)
+    version = bytes(view[:1])
+    if version == STORAGE_FORMAT_V6:
+        # format, suite tag, codec, chunk size, nonce prefix
+        cipher = _aead(key, view[1], b"stream")
+        fields_offset = 2
+    elif version == STORAGE_FORMAT_V4:
+        # format, codec, chunk size, nonce prefix; always AES-256-GCM
+        cipher = _stream_cipher(key)
+        fields_offset = 1
+    else:
+        raise InvalidToken
+    header_size = fields_offset + 1 + 4 + STREAM_NONCE_PREFIX_SIZE
+    header = bytes(view[:header_size])
+    codec = header[fields_offset]
+    chunk_size = struct.unpack(">I", header[fields_offset + 1 : fields_offset + 5])[0] + STREAM_TAG_SIZE
+    prefix = header[fields_offset + 5 :]
+    decompressor = zlib.decompressobj() if codec == CODEC_ZLIB else None
+
+    offset = header_size
+    counter = 0
+    while True:
+        chunk = view[offset : offset + chunk_size]
+        offset += len(chunk)
+        last = offset >= len(view)
+        try:
+            plaintext = cipher.decrypt(_stream_nonce(prefix, counter, last), bytes(chunk), header)
+        except InvalidTag:
+            raise InvalidToken
+        yield decompressor.decompress(plaintext) if decompressor else plaintext
+        if last:
+            break
+        counter += 1
+    if decompressor:
+        yield decompressor.flush()
+
+
+def _seal(key: bytes, data: bytes) -> bytes:
+    if len(data) >= STREAM_THRESHOLD:
+        view = memoryview(data)
+        pieces = (view[i : i + STREAM_CHUNK_SIZE] for i in range(0, len(data), STREAM_CHUNK_SIZE))
+        return b"".join(encrypt_stream(key, pieces))
+    # v5: format byte, suite tag and nonce followed by the AEAD ciphertext, stored
+    # as a BLOB. The encrypted plaintext starts with a codec byte, and the format
+    # and suite bytes are authenticated as associated data.
+    suite = get_cipher_suite()
+    header = STORAGE_FORMAT_V5 + bytes((suite.tag,))
+    nonce = os.urandom(AEAD_NONCE_SIZE)
+    return header + nonce + _aead(key, suite.tag, b"value").encrypt(nonce, _compress(data), header)
+
+
+def _seal_json(key: bytes, value: Any) -> bytes:
+    # Encodes incrementally and switches to the streaming format once the value
+    # is large, so big values never exist as one plaintext string.
+    pieces = json.JSONEncoder().iterencode(value)
+    buffered = []
+    size = 0
+    for piece in pieces:
+        buffered.append(piece)
+        size += len(piece)
+        if size >= STREAM_THRESHOLD:
+            encoded = (piece.encode("utf-8") for piece in itertools.chain(buffered, pieces))
+            return b"".join(encrypt_stream(key, encoded))
+    return _seal(key, "".join(buffered).encode("utf-8"))
+
+
+def _open(key: bytes, stored: Union[str, bytes]) -> bytes:
+    if isinstance(stored, str):
+        # v1: base64 of the Fernet token, stored as a JSON string
+        return _fernet(key).decrypt(urlsafe_b64decode(stored))
+    version = stored[:1]
+    if version == STORAGE_FORMAT_V5:
+        nonce_end = 2 + AEAD_NONCE_SIZE
+        try:
+            plaintext = _aead(key, stored[1], b"value").decrypt(stored[2:nonce_end], stored[nonce_end:], stored[:2])
+        except InvalidTag:
+            raise InvalidToken
+        return _decompress(plaintext)
+    elif version in (STORAGE_FORMAT_V4, STORAGE_FORMAT_V6):
+        return b"".join(decrypt_stream(key, stored))
+    token = urlsafe_b64encode(stored[1:])
+    if version == STORAGE_FORMAT_V3:
+        return _decompress(_fernet(key).decrypt(token))
+    elif version == STORAGE_FORMAT_V2:
+        return _fernet(key).decrypt(token)
+    raise InvalidToken
+
+
 def save_encrypted(encryption_key: str, value_key: str, value: Dict) -> None:
+    encrypted_value = _seal_json(urlsafe_b64decode(encryption_key), value)
     with KV() as kv:
-        encrypted_value = encrypt(urlsafe_b64decode(encryption_key), json.dumps(value))
-        kv.put(
-            value_key,
-            urlsafe_b64encode(encrypted_value).decode("utf-8"),
-        )
+        kv.put(value_key, encrypted_value)
 
 
 def get_encrypted(encryption_key: str, value_key: str) -> Optional[Dict]:
     with KV() as kv:
-        encrypted_value = kv.get(value_key)
-        if encrypted_value:
-            decrypted_value = decrypt(urlsafe_b64decode(encryption_key), urlsafe_b64decode(encrypted_value))
+        stored = kv.get(value_key)
+        if stored:
+            key = urlsafe_b64decode(encryption_key)
+            decrypted_value = _open(key, stored)
+            if isinstance(stored, str) or stored[:1] not in (STORAGE_FORMAT_V5, STORAGE_FORMAT_V6):
+                kv.put(value_key, _seal(key, decrypted_value))
             return json.loads(decrypted_value)
+
+
+@functools.lru_cache(maxsize=4)
+def _digest_key(key: bytes) -> bytes:
+    return hmac.new(key, b"sealed.digest.v1", hashlib.sha256).digest()
+
+
+def _record_digest(key: bytes, data: str) -> str:
+    return hmac.new(_digest_key(key), data.encode("utf-8"), hashlib.sha256).hexdigest()[:16]
+
+
+@functools.lru_cache(maxsize=4)
+def _search_key(key: bytes) -> bytes:
+    return hmac.new(key, b"sealed.search.v1", hashlib.sha256).digest()
+
+
+def _blind(search_key: bytes, token: str) -> str:
+    digest = hmac.new(search_key, token[:SEARCH_MAX_PREFIX].encode("utf-8"), hashlib.sha256).digest()
+    return urlsafe_b64encode(digest[:SEARCH_BLIND_SIZE]).decode("utf-8")
+
+
+def _build_search_index(key: bytes, records: List[Dict], search_fields: List[str]) -> Dict:
+    # Maps the keyed hash of every token prefix (up to SEARCH_MAX_PREFIX
+    # characters) to record positions in the {namespace}.index order. The map
+    # is sealed like any other value, so neither tokens nor their hashes are
+    # readable from disk.
+    search_key = _search_key(key)
+    blinded: Dict[str, List[int]] = {}
+    for position, record in enumerate(records):
+        prefixes = set()
+        for search_field in search_fields:
+            for token in search_tokens(str(record.get(search_field) or "")):
+                prefixes.update(token[:size] for size in range(1, min(len(token), SEARCH_MAX_PREFIX) + 1))
+        for prefix in prefixes:
+            blinded.setdefault(_blind(search_key, prefix), []).append(position)
+    return {"fields": search_fields, "tokens": blinded}
+
+
+def save_encrypted_records(
+    encryption_key: str,
+    namespace: str,
+    records: List[Dict],
+    id_field: str = "id",
+    search_fields: Optional[List[str]] = None,
+) -> int:
+    # Each record lives in its own {namespace}.record.{id} row. The encrypted
+    # {namespace}.index keeps [id, keyed digest] pairs in order, so only
+    # records whose content changed are re-encrypted and rewritten. With
+    # search_fields, a blind token index is written to {namespace}.search.
+    key = urlsafe_b64decode(encryption_key)
+    index = get_encrypted(encryption_key, f"{namespace}.index") or {}
+    old_digests: Dict[str, str] = dict(index.get("records", []))
+    digests: Dict[str, str] = {}
+    written = 0
+
+    with KV() as kv:
+        for record in records:
+            record_id = record[id_field]
+            data = json.dumps(record)
+            digest = _record_digest(key, data)
+            digests[record_id] = digest
+            if old_digests.get(record_id) != digest:
+                kv.put_cached(f"{namespace}.record.{record_id}", _seal(key, data.encode("utf-8")))
+                written += 1
+        new_index = {"records": list(digests.items())}
+        kv.put_cached(f"{namespace}.index", _seal_json(key, new_index))
+        if search_fields:
+            search_index = _build_search_index(key, records, search_fields)
+            kv.put_cached(f"{namespace}.search", _seal_json(key, search_index))
+        kv.commit_cached()
+
+        kv.delete_many(f"{namespace}.record.{record_id}" for record_id in old_digests.keys() - digests.keys())
+    return written
+
+
+def get_encrypted_records(encryption_key: str, namespace: str) -> Optional[List[Dict]]:
+    index = get_encrypted(encryption_key, f"{namespace}.index")
+    if index is None:
+        return None
+
+    key = urlsafe_b64decode(encryption_key)
+    prefix = f"{namespace}.record."
+    with KV() as kv:
+        rows = dict(kv.get_partial(prefix))
+
+    records = []
+    for record_id, _ in index.get("records", []):
+        stored = rows.get(f"{prefix}{record_id}")
+        if stored:
+            records.append(json.loads(_open(key, stored)))
+    return records
+
+
+def get_encrypted_record(encryption_key: str, namespace: str, record_id: str) -> Optional[Dict]:
+    return get_encrypted(encryption_key, f"{namespace}.record.{record_id}")
+
+
+def search_encrypted_records(encryption_key: str, namespace: str, query: str) -> Optional[List[Dict]]:
+    # Returns None when the namespace has no search index, so callers can
+    # fall back to a full scan. Only candidate records are decrypted, and each
+    # one is checked against the query to drop hash collisions.
+    search_index = get_encrypted(encryption_key, f"{namespace}.search")
+    index = get_encrypted(encryption_key, f"{namespace}.index")
+    if search_index is None or index is None:
+        return None
+
+    query_tokens = search_tokens(query)
+    if not query_tokens:
+        return get_encrypted_records(encryption_key, namespace)
+
+    key = urlsafe_b64decode(encryption_key)
+    search_key = _search_key(key)
+    tokens = search_index.get("tokens", {})
+    candidates = None
+    for query_token in query_tokens:
+        positions = set(tokens.get(_blind(search_key, query_token), []))
+        candidates = positions if candidates is None else candidates & positions
+        if not candidates:
+            return []
+
+    record_ids = index.get("records", [])
+    row_keys = [
+        f"{namespace}.record.{record_ids[position][0]}"
+        for position in sorted(candidates or [])
+        if position < len(record_ids)
+    ]
+    with KV() as kv:
+        rows = kv.get_many(row_keys)
+
+    search_fields = search_index.get("fields", [])
+    records = []
+    for row_key in row_keys:
+        stored = rows.get(row_key)
+        if not stored:
+            continue
+        record = json.loads(_open(key, stored))
+        record_tokens = [
+            token for search_field in search_fields for token in search_tokens(str(record.get(search_field) or ""))
+        ]
+        if matches_tokens(query_tokens, record_tokens):
+            records.append(record)
+    return records
+
+
+def _boot_id() -> str:
+    try:
+        with open(BOOT_ID_PATH) as f:
+            return f.read().strip()
+    except OSError:
+        return ""
+
+
+def _pin_key(pin: str, salt: bytes, params: KdfParams) -> bytes:
+    return _derive(pin.encode("utf-8"), salt, params)
+
+
+def _pin_path() -> Optional[str]:
+    runtime_path = get_runtime_path()
+    return os.path.join(runtime_path, PIN_FILE) if runtime_path else None
+
+
+def _read_pin() -> Optional[Dict[str, Any]]:
+    path = _pin_path()
+    if not path:
+        return None
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_pin(wrap: Dict[str, Any]) -> None:
+    path = _pin_path()
+    assert path
+    os.makedirs(os.path.dirname(path), mode=0o700, exist_ok=True)
+    tmp_path = f"{path}.tmp"
+    with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600), "w") as f:
+        json.dump(wrap, f)
+    os.replace(tmp_path, path)
+
+
+def _drop_legacy_pin() -> None:
+    # older versions kept the wrap in kv.db
+    with KV() as kv:
+        kv.delete("encryption.pin")
+        kv.delete("encryption.pin_attempts")
+
+
+def pin_available() -> bool:
+    return get_runtime_path() is not None
+
+
+def enable_pin(encryption_key: str, pin: str) -> bool:
+    # The encryption key is wrapped with a key derived from the PIN, with its
+    # own short KDF calibration recorded in the wrap. The wrap lives in the
+    # runtime dir, a tmpfs that is emptied on restart, so it never reaches
+    # flash; the boot id is authenticated with it as well, and the attempt
+    # counter bounds guessing.
+    if not pin_available():
+        return False
+    salt = generate_salt()
+    params = calibrate_kdf(KDF_PIN_TARGET_SECONDS, KDF_PIN_MIN_ITERATIONS)
+    suite = get_cipher_suite()
+    boot_id = _boot_id()
+    nonce = os.urandom(AEAD_NONCE_SIZE)
+    cipher = _aead(_pin_key(pin, salt, params), suite.tag, b"pin")
+    wrapped = cipher.encrypt(nonce, encryption_key.encode("utf-8"), boot_id.encode("utf-8"))
+    _write_pin(
+        {
+            "salt": urlsafe_b64encode(salt).decode("utf-8"),
+            "kdf": asdict(params),
+            "suite": suite.tag,
+            "boot_id": boot_id,
+            "wrapped": urlsafe_b64encode(nonce + wrapped).decode("utf-8"),
+            "attempts": 0,
+        }
+    )
+    _drop_legacy_pin()
+    return True
+
+
+def disable_pin() -> None:
+    path = _pin_path()
+    if path:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+    _drop_legacy_pin()
+
+
+def pin_enabled() -> bool:
+    wrap = _read_pin()
+    return bool(wrap) and wrap.get("boot_id") == _boot_id() and wrap.get("attempts", 0) < PIN_MAX_ATTEMPTS
+
+
+def unlock_with_pin(pin: str) -> Optional[str]:
+    wrap = _read_pin()
+    if not wrap:
+        return None
+    attempts = wrap.get("attempts", 0)
+    if wrap.get("boot_id") != _boot_id() or attempts >= PIN_MAX_ATTEMPTS:
+        disable_pin()
+        return None
+    # counted before trying, so killing the app mid-attempt still counts
+    wrap["attempts"] = attempts + 1
+    _write_pin(wrap)
+
+    stored = urlsafe_b64decode(wrap["wrapped"])
+    nonce, wrapped = stored[:AEAD_NONCE_SIZE], stored[AEAD_NONCE_SIZE:]
+    pin_key = _pin_key(pin, urlsafe_b64decode(wrap["salt"]), KdfParams(**wrap["kdf"]))
+    cipher = _aead(pin_key, wrap["suite"], b"pin")
+    try:
+        encryption_key = cipher.decrypt(nonce, wrapped, wrap["boot_id"].encode("utf-8")).decode("utf-8")
+    except InvalidTag:
+        if attempts + 1 >= PIN_MAX_ATTEMPTS:
+            disable_pin()
+        return None
+
+    wrap["attempts"] = 0
+    _write_pin(wrap)
+    return encryption_key
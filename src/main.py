@@ -16,14 +16,17 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 from src.constants import APP_NAME, CRASH_REPORT_URL
 from src.ut_components import setup
-from src.utils import parse_bw_date
+from src.utils import matches_tokens, parse_bw_date, search_tokens
 
 setup(APP_NAME, CRASH_REPORT_URL)
+import hmac
 import secrets
 import string
-from dataclasses import asdict, dataclass, field
+import threading
+from dataclasses import dataclass, field
+from datetime import timedelta
 from functools import wraps
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, List, Optional, Tuple
 
 import pyotherside
 from cryptography.fernet import InvalidToken
@@ -50,19 +53,57 @@ from src.bitwarden_client import (
     bitwarden_unlock,
 )
 from src.encryption import (
+    clear_key_cache,
+    disable_pin,
+    enable_pin,
     generate_key_from_password,
     get_encrypted,
+    get_encrypted_record,
+    get_encrypted_records,
+    kdf_needs_upgrade,
+    pin_enabled,
     save_encrypted,
+    save_encrypted_records,
+    search_encrypted_records,
+    unlock_with_pin,
+    upgrade_kdf,
 )
-from src.totp import get_totp_state
+from src.totp import clear_totp_cache, get_totp_window
 from src.ut_components.crash import crash_reporter, get_crash_report, set_crash_report
 from src.ut_components.enum import StrEnum
-from src.ut_components.event import Event, get_event_dispatcher
-from src.ut_components.kv import KV
-from src.ut_components.utils import dataclass_to_dict
+from src.ut_components.event import PRIORITY_LOW, Event, get_event_dispatcher
+from src.ut_components.kv import (
+    KV,
+    set_namespace_limit,
+    set_read_cache_size,
+    set_write_behind,
+)
+from src.ut_components.utils import dataclass_to_dict, short_string, to_qml
 
 DACITE_CONFIG = Config(strict=True, cast=[BitwardenItemType])
 
+# config.server_url, crash.enabled, loading, encryption.salt and bw.session_key
+# are read on almost every call; keep them (and other small keys) in memory.
+set_read_cache_size(256 * 1024)
+# loading only drives the spinner; it is flipped around every event and does
+# not need a commit each time.
+set_write_behind(["loading"])
+# memoized results are only a cache; keep them from filling the phone.
+set_namespace_limit("memoize", max_bytes=4 * 1024 * 1024)
+
+# (encryption_key, session_key) of the unlocked vault, kept in memory so that
+# every mutation does not have to read and decrypt bw.session_key from KV.
+SESSION: Optional[Tuple[str, str]] = None
+# (encryption_key, {cache key: parsed value}) of the unlocked vault, filled in
+# the background after unlock so list pages render from memory.
+VAULT_CACHE: Optional[Tuple[str, Dict[str, Any]]] = None
+# Bumped by logout and set_server. Background jobs carry the epoch they were
+# scheduled in and their writes to SESSION, VAULT_CACHE and the vault records
+# are dropped once it is stale, so a job still running after logout can't
+# bring the session back.
+SESSION_EPOCH = 0
+SESSION_LOCK = threading.RLock()
+
 
 def clear_loading_state() -> None:
     with KV() as kv:
@@ -90,10 +131,26 @@ def emit_loading(func: Callable) -> Callable:
     return wrapper
 
 
+class ReapExpiredEvent(Event):
+    def trigger(self, metadata: Optional[Dict]) -> object:
+        with KV() as kv:
+            return kv.reap_expired()
+
+
+get_event_dispatcher().register_event(
+    ReapExpiredEvent(id="reap-expired", execution_interval=timedelta(minutes=15), priority=PRIORITY_LOW)
+)
+
+
 def start_event_loop():
     get_event_dispatcher().start()
 
 
+def schedule_session_event(event_id: str, encryption_key: str, **metadata: Any) -> None:
+    metadata.update(encryption_key=encryption_key, epoch=SESSION_EPOCH)
+    get_event_dispatcher().schedule(event_id=event_id, metadata=metadata)
+
+
 def setup_bw():
     with KV() as kv:
         setup_done = kv.put("sealed.setup_done", False) or False
@@ -105,13 +162,54 @@ def setup_bw():
 
 
 def set_session_key(encryption_key: str, session_key: str) -> None:
+    global SESSION
     save_encrypted(encryption_key, "bw.session_key", {"session_key": session_key})
+    with SESSION_LOCK:
+        SESSION = (encryption_key, session_key)
+
 
+def get_session_key(encryption_key: str, epoch: Optional[int] = None) -> Optional[str]:
+    global SESSION
+    if epoch is None:
+        epoch = SESSION_EPOCH
+    session = SESSION
+    if session and hmac.compare_digest(session[0], encryption_key):
+        return session[1]
 
-def get_session_key(encryption_key: str) -> Optional[str]:
     result = get_encrypted(encryption_key, "bw.session_key")
     if result:
-        return result.get("session_key")
+        session_key = result.get("session_key")
+        if session_key:
+            with SESSION_LOCK:
+                if epoch == SESSION_EPOCH:
+                    SESSION = (encryption_key, session_key)
+        return session_key
+
+
+def clear_session_key() -> None:
+    global SESSION
+    with SESSION_LOCK:
+        SESSION = None
+
+
+def end_session() -> None:
+    global SESSION, VAULT_CACHE, SESSION_EPOCH
+    with SESSION_LOCK:
+        SESSION_EPOCH += 1
+        SESSION = None
+        VAULT_CACHE = None
+
+
+def send_unlock_progress(progress: float) -> None:
+    pyotherside.send("unlock-progress", progress)
+
+
+def upgrade_encryption_key(password: str, encryption_key: str) -> str:
+    if not kdf_needs_upgrade():
+        return encryption_key
+    encryption_key = upgrade_kdf(password, encryption_key, ["bw."], send_unlock_progress)
+    clear_session_key()
+    return encryption_key
 
 
 def exist_session_key() -> bool:
@@ -132,6 +230,7 @@ class LoginScreenFields(StrEnum):
     EMAIL = "email"
     PASSWORD = "password"
     TOTP = "totp"
+    PIN = "pin"
 
 
 @dataclass
@@ -146,6 +245,8 @@ def login_screen() -> LoginScreen:
     setup_bw()
 
     if exist_session_key():
+        if pin_enabled():
+            return LoginScreen(show=True, fields=[LoginScreenFields.PIN, LoginScreenFields.PASSWORD])
         return LoginScreen(show=True, fields=[LoginScreenFields.PASSWORD])
 
     status = bitwarden_status()
@@ -161,9 +262,14 @@ def login_screen() -> LoginScreen:
         raise Exception(f"Unknown Bitwarden status {status.value}")
 
 
+def unlocked(encryption_key: str) -> StandardBitwardenResponse:
+    schedule_session_event("warm-caches", encryption_key)
+    return StandardBitwardenResponse(success=True, message=encryption_key)
+
+
 @crash_reporter
 @dataclass_to_dict
-def login(email: str = "", password: str = "", code: str = "") -> StandardBitwardenResponse:
+def login(email: str = "", password: str = "", code: str = "", pin: str = "") -> StandardBitwardenResponse:
     if email:
         session_key_response = bitwarden_login(email, password, code)
         if not session_key_response.success:
@@ -171,17 +277,19 @@ def login(email: str = "", password: str = "", code: str = "") -> StandardBitwar
                 success=False, message=f"Error during bitwarden login: {session_key_response.data}"
             )
         else:
-            encryption_key = generate_key_from_password(password)
+            encryption_key = generate_key_from_password(password, send_unlock_progress)
             set_session_key(encryption_key, session_key_response.data)
-            return StandardBitwardenResponse(success=True, message=encryption_key)
+            encryption_key = upgrade_encryption_key(password, encryption_key)
+            return unlocked(encryption_key)
     elif password:
         try:
-            encryption_key = generate_key_from_password(password)
+            encryption_key = generate_key_from_password(password, send_unlock_progress)
             session_key = get_session_key(encryption_key)
         except InvalidToken:
             return StandardBitwardenResponse(success=False, message="Invalid Password")
         if session_key:
-            return StandardBitwardenResponse(success=True, message=encryption_key)
+            encryption_key = upgrade_encryption_key(password, encryption_key)
+            return unlocked(encryption_key)
         else:
             session_key_response = bitwarden_unlock(password)
             if not session_key_response.success:
@@ -189,10 +297,39 @@ def login(email: str = "", password: str = "", code: str = "") -> StandardBitwar
                     success=False, message=f"Error during bitwarden unlock: {session_key_response.data}"
                 )
             set_session_key(encryption_key, session_key_response.data)
-            return StandardBitwardenResponse(success=True, message=encryption_key)
+            encryption_key = upgrade_encryption_key(password, encryption_key)
+            return unlocked(encryption_key)
+    elif pin:
+        encryption_key = unlock_with_pin(pin)
+        try:
+            session_key = get_session_key(encryption_key) if encryption_key else None
+        except InvalidToken:
+            session_key = None
+        if not session_key:
+            return StandardBitwardenResponse(success=False, message="Invalid PIN")
+        return unlocked(encryption_key)
     return StandardBitwardenResponse(success=False, message="Unknown error happened")
 
 
+@crash_reporter
+@dataclass_to_dict
+def set_pin(encryption_key: str, pin: str) -> StandardBitwardenResponse:
+    if not pin:
+        return StandardBitwardenResponse(success=False, message="PIN can not be empty")
+    if not get_session_key(encryption_key):
+        return StandardBitwardenResponse(success=False, message="Not logged in")
+    if not enable_pin(encryption_key, pin):
+        return StandardBitwardenResponse(success=False, message="PIN unlock is not available on this device")
+    return StandardBitwardenResponse(success=True)
+
+
+@crash_reporter
+@dataclass_to_dict
+def remove_pin() -> StandardBitwardenResponse:
+    disable_pin()
+    return StandardBitwardenResponse(success=True)
+
+
 @dataclass
 class Field:
     name: str
@@ -236,6 +373,80 @@ class BWKeys(StrEnum):
     LIST_TRASH_ITEMS = "bw.list_trash_items"
     LIST_FOLDERS = "bw.list_folders"
     LIST_FOLDER_ITEMS = "bw.list_folder_items"
+    ITEMS = "bw.items"
+    TRASH_ITEMS = "bw.trash_items"
+
+
+def get_vault_cache(encryption_key: str, cache_key: str) -> Any:
+    cache = VAULT_CACHE
+    if cache and hmac.compare_digest(cache[0], encryption_key):
+        return cache[1].get(cache_key)
+
+
+def set_vault_cache(encryption_key: str, cache_key: str, value: Any, epoch: int) -> None:
+    global VAULT_CACHE
+    with SESSION_LOCK:
+        if epoch != SESSION_EPOCH:
+            return
+        cache = VAULT_CACHE
+        if not cache or not hmac.compare_digest(cache[0], encryption_key):
+            cache = (encryption_key, {})
+            VAULT_CACHE = cache
+        cache[1][cache_key] = value
+
+
+@dataclass
+class ItemIndex:
+    result: ListItemsResult
+    by_id: Dict[str, Item]
+    # (name and username search tokens, item id) in display order
+    search_keys: List[Tuple[List[str], str]]
+
+
+def build_item_index(result: ListItemsResult) -> ItemIndex:
+    return ItemIndex(
+        result=result,
+        by_id={item.id: item for item in result.items},
+        search_keys=[(search_tokens(f"{item.name} {item.username}"), item.id) for item in result.items],
+    )
+
+
+def save_item_records(
+    encryption_key: str, namespace: str, legacy_key: str, response: ListItemsResult, epoch: int
+) -> None:
+    with SESSION_LOCK:
+        if epoch != SESSION_EPOCH:
+            return
+        save_encrypted_records(encryption_key, namespace, to_qml(response.items), search_fields=["name", "username"])
+        set_vault_cache(encryption_key, namespace, build_item_index(response), epoch)
+    with KV() as kv:
+        kv.delete(legacy_key)
+
+
+def load_item_index(encryption_key: str, namespace: str, legacy_key: str, epoch: Optional[int] = None) -> ItemIndex:
+    if epoch is None:
+        epoch = SESSION_EPOCH
+    index = get_vault_cache(encryption_key, namespace)
+    if index is not None:
+        return index
+
+    items = get_encrypted_records(encryption_key, namespace)
+    if items is not None:
+        result = from_dict(ListItemsResult, {"success": True, "items": items}, DACITE_CONFIG)
+    else:
+        legacy_items = get_encrypted(encryption_key, legacy_key)
+        if legacy_items:
+            result = from_dict(ListItemsResult, legacy_items, DACITE_CONFIG)
+        else:
+            result = ListItemsResult(success=True, items=[])
+
+    index = build_item_index(result)
+    set_vault_cache(encryption_key, namespace, index, epoch)
+    return index
+
+
+def load_item_records(encryption_key: str, namespace: str, legacy_key: str) -> ListItemsResult:
+    return load_item_index(encryption_key, namespace, legacy_key).result
 
 
 class SyncItems(Event):
@@ -245,7 +456,8 @@ class SyncItems(Event):
         if not encryption_key:
             return ListItemsResult(success=False, items=[])
 
-        session_key = get_session_key(encryption_key)
+        epoch = metadata.get("epoch", SESSION_EPOCH)
+        session_key = get_session_key(encryption_key, epoch)
         if not session_key:
             return ListItemsResult(success=False, items=[])
 
@@ -285,7 +497,7 @@ class SyncItems(Event):
                 )
 
         response = ListItemsResult(success=True, items=sorted(parsed_items, key=lambda x: (not x.favorite, x.name)))
-        save_encrypted(encryption_key, BWKeys.LIST_ITEMS, asdict(response))
+        save_item_records(encryption_key, BWKeys.ITEMS, BWKeys.LIST_ITEMS, response, epoch)
         return response
 
 
@@ -313,7 +525,8 @@ class SyncFoldersEvent(Event):
         if not encryption_key:
             return ListFolderResult(success=False, folders=[])
 
-        session_key = get_session_key(encryption_key)
+        epoch = metadata.get("epoch", SESSION_EPOCH)
+        session_key = get_session_key(encryption_key, epoch)
         if not session_key:
             return ListFolderResult(success=False, folders=[])
 
@@ -332,25 +545,104 @@ class SyncFoldersEvent(Event):
             )
 
         response = ListFolderResult(success=True, folders=sorted(parsed_folders, key=lambda x: x.name))
-        save_encrypted(encryption_key, BWKeys.LIST_FOLDERS, asdict(response))
+        with SESSION_LOCK:
+            if epoch == SESSION_EPOCH:
+                save_encrypted(encryption_key, BWKeys.LIST_FOLDERS, to_qml(response))
+                set_vault_cache(encryption_key, BWKeys.LIST_FOLDERS, response, epoch)
         return response
 
 
 get_event_dispatcher().register_event(SyncFoldersEvent(id="sync-folders"))
 
 
+def load_folders(encryption_key: str, epoch: Optional[int] = None) -> ListFolderResult:
+    if epoch is None:
+        epoch = SESSION_EPOCH
+    folders = get_vault_cache(encryption_key, BWKeys.LIST_FOLDERS)
+    if folders is not None:
+        return folders
+
+    items = get_encrypted(encryption_key, BWKeys.LIST_FOLDERS)
+    if items:
+        folders = from_dict(ListFolderResult, items, DACITE_CONFIG)
+    else:
+        folders = ListFolderResult(success=True, folders=[])
+    set_vault_cache(encryption_key, BWKeys.LIST_FOLDERS, folders, epoch)
+    return folders
+
+
+class WarmCachesEvent(Event):
+    def trigger(self, metadata: Dict) -> object:
+        encryption_key = metadata.get("encryption_key")
+        if not encryption_key:
+            return None
+
+        epoch = metadata.get("epoch", SESSION_EPOCH)
+        get_session_key(encryption_key, epoch)
+        load_item_index(encryption_key, BWKeys.ITEMS, BWKeys.LIST_ITEMS, epoch)
+        load_folders(encryption_key, epoch)
+        load_item_index(encryption_key, BWKeys.TRASH_ITEMS, BWKeys.LIST_TRASH_ITEMS, epoch)
+        return None
+
+
+get_event_dispatcher().register_event(WarmCachesEvent(id="warm-caches", priority=PRIORITY_LOW))
+
+
 @crash_reporter
 @dataclass_to_dict
 def list_items(encryption_key: str) -> ListItemsResult:
-    get_event_dispatcher().schedule(event_id="sync-items", metadata={"encryption_key": encryption_key})
-    get_event_dispatcher().schedule(event_id="sync-folders", metadata={"encryption_key": encryption_key})
+    schedule_session_event("sync-items", encryption_key)
+    schedule_session_event("sync-folders", encryption_key)
 
-    items = get_encrypted(encryption_key, BWKeys.LIST_ITEMS)
-    if not items:
-        return ListItemsResult(success=True, items=[])
+    return load_item_records(encryption_key, BWKeys.ITEMS, BWKeys.LIST_ITEMS)
 
-    parsed_items = from_dict(ListItemsResult, items, DACITE_CONFIG)
-    return parsed_items
+
+@crash_reporter
+@dataclass_to_dict
+def search_items(
+    encryption_key: str, query: str, trash: bool = False, folder_id: Optional[str] = None
+) -> ListItemsResult:
+    # The list pages' search field: every query token must start a token of the
+    # item's name or username. folder_id narrows the results to one folder.
+    namespace, legacy_key = (
+        (BWKeys.TRASH_ITEMS, BWKeys.LIST_TRASH_ITEMS) if trash else (BWKeys.ITEMS, BWKeys.LIST_ITEMS)
+    )
+    query_tokens = search_tokens(query)
+
+    index = get_vault_cache(encryption_key, namespace)
+    if index is None:
+        records = search_encrypted_records(encryption_key, namespace, query)
+        if records is not None:
+            if folder_id is not None:
+                records = [record for record in records if record.get("folder_id") == folder_id]
+            return from_dict(ListItemsResult, {"success": True, "items": records}, DACITE_CONFIG)
+        index = load_item_index(encryption_key, namespace, legacy_key)
+
+    items = [index.by_id[item_id] for tokens, item_id in index.search_keys if matches_tokens(query_tokens, tokens)]
+    if folder_id is not None:
+        items = [item for item in items if item.folder_id == folder_id]
+    return ListItemsResult(success=True, items=items)
+
+
+@dataclass
+class GetItemResult:
+    success: bool
+    item: Optional[Item] = None
+
+
+@crash_reporter
+@dataclass_to_dict
+def get_item(encryption_key: str, item_id: str) -> GetItemResult:
+    for namespace in (BWKeys.ITEMS, BWKeys.TRASH_ITEMS):
+        index = get_vault_cache(encryption_key, namespace)
+        if index is not None and item_id in index.by_id:
+            return GetItemResult(success=True, item=index.by_id[item_id])
+
+    for namespace in (BWKeys.ITEMS, BWKeys.TRASH_ITEMS):
+        item = get_encrypted_record(encryption_key, namespace, item_id)
+        if item:
+            return GetItemResult(success=True, item=from_dict(Item, item, DACITE_CONFIG))
+    return GetItemResult(success=False)
 
 
 @dataclass
@@ -365,12 +657,88 @@ def get_totp(secret: str) -> Totp:
     if not secret:
         return Totp(code="", seconds_remaining=0)
     try:
-        code, seconds_remaining = get_totp_state(secret)
+        _, code, _, seconds_remaining = get_totp_window(secret)
         return Totp(code=code, seconds_remaining=seconds_remaining)
     except Exception:
         return Totp(code="", seconds_remaining=0)
 
 
+@dataclass
+class TotpWindow:
+    secret: str
+    code: str = ""
+    next_code: str = ""
+    seconds_remaining: int = 0
+    period: int = 0
+    digits: int = 0
+    algorithm: str = ""
+
+
+@dataclass
+class TotpBatch:
+    items: List[TotpWindow]
+
+
+def totp_window(secret: str) -> TotpWindow:
+    if not secret:
+        return TotpWindow(secret=secret)
+    try:
+        params, code, next_code, seconds_remaining = get_totp_window(secret)
+    except Exception:
+        return TotpWindow(secret=secret)
+    return TotpWindow(
+        secret=secret,
+        code=code,
+        next_code=next_code,
+        seconds_remaining=seconds_remaining,
+        period=params.period,
+        digits=params.digits,
+        algorithm="STEAM" if params.steam else params.algorithm,
+    )
+
+
+@crash_reporter
+@dataclass_to_dict
+def get_totp_batch(totp_secrets: List[str]) -> TotpBatch:
+    return TotpBatch(items=[totp_window(secret) for secret in totp_secrets])
+
+
+# subscription_id -> secret for every page currently showing a TOTP code
+TOTP_SUBSCRIPTIONS: Dict[str, str] = {}
+
+
+class TotpPushEvent(Event):
+    def trigger(self, metadata: Optional[Dict]) -> object:
+        totp_secrets = set(TOTP_SUBSCRIPTIONS.values())
+        if not totp_secrets:
+            return None
+        return TotpBatch(items=[totp_window(secret) for secret in totp_secrets])
+
+
+get_event_dispatcher().register_event(
+    TotpPushEvent(id="totp", execution_interval=timedelta(seconds=30), align_to_interval=True)
+)
+
+
+@dataclass
+class TotpSubscription:
+    subscription_id: str
+    totp: TotpWindow
+
+
+@crash_reporter
+@dataclass_to_dict
+def subscribe_totp(secret: str) -> TotpSubscription:
+    subscription_id = short_string()
+    TOTP_SUBSCRIPTIONS[subscription_id] = secret
+    return TotpSubscription(subscription_id=subscription_id, totp=totp_window(secret))
+
+
+@crash_reporter
+def unsubscribe_totp(subscription_id: str) -> None:
+    TOTP_SUBSCRIPTIONS.pop(subscription_id, None)
+
+
 @crash_reporter
 @dataclass_to_dict
 def add_login(
@@ -399,7 +767,7 @@ def add_login(
         favorite=favorite,
         folder_id=folder_id,
     )
-    get_event_dispatcher().schedule(event_id="sync-items", metadata={"encryption_key": encryption_key})
+    schedule_session_event("sync-items", encryption_key)
     if result.success:
         return StandardBitwardenResponse(success=True)
     else:
@@ -438,7 +806,7 @@ def add_card(
         favorite=favorite,
         folder_id=folder_id,
     )
-    get_event_dispatcher().schedule(event_id="sync-items", metadata={"encryption_key": encryption_key})
+    schedule_session_event("sync-items", encryption_key)
     if result.success:
         return StandardBitwardenResponse(success=True)
     else:
@@ -474,7 +842,7 @@ def edit_login(
         favorite=favorite,
         folder_id=folder_id,
     )
-    get_event_dispatcher().schedule(event_id="sync-items", metadata={"encryption_key": encryption_key})
+    schedule_session_event("sync-items", encryption_key)
     if result.success:
         return StandardBitwardenResponse(success=True)
     else:
@@ -514,7 +882,7 @@ def edit_card(
         favorite=favorite,
         folder_id=folder_id,
     )
-    get_event_dispatcher().schedule(event_id="sync-items", metadata={"encryption_key": encryption_key})
+    schedule_session_event("sync-items", encryption_key)
     if result.success:
         return StandardBitwardenResponse(success=True)
     else:
@@ -524,7 +892,7 @@ def edit_card(
 @crash_reporter
 @dataclass_to_dict
 def refresh(encryption_key: str) -> StandardBitwardenResponse:
-    get_event_dispatcher().schedule(event_id="sync-items", metadata={"encryption_key": encryption_key})
+    schedule_session_event("sync-items", encryption_key)
     return StandardBitwardenResponse(success=True)
 
 
@@ -537,8 +905,10 @@ def set_server(url: str) -> StandardBitwardenResponse:
     if not response.success:
         return StandardBitwardenResponse(success=False, message=response.data)
 
+    end_session()
+    disable_pin()
     with KV() as kv:
-        kv.delete_partial("bw")
+        kv.clear_namespace("bw")
         kv.put("config.server_url", url)
     return StandardBitwardenResponse(success=True)
 
@@ -547,6 +917,7 @@ def set_server(url: str) -> StandardBitwardenResponse:
 class Configuration:
     server_url: str
     crash_logs: bool
+    pin_enabled: bool
 
 
 @crash_reporter
@@ -555,7 +926,7 @@ def get_configuration() -> Configuration:
     with KV() as kv:
         server_url = kv.get("config.server_url", "bitwarden.com", True) or "bitwarden.com"
         crash_logs = get_crash_report()
-    return Configuration(server_url=server_url, crash_logs=crash_logs)
+    return Configuration(server_url=server_url, crash_logs=crash_logs, pin_enabled=pin_enabled())
 
 
 def set_crash_logs(enabled: bool):
@@ -565,9 +936,14 @@ def set_crash_logs(enabled: bool):
 @crash_reporter
 @dataclass_to_dict
 def logout() -> StandardBitwardenResponse:
+    end_session()
+    clear_key_cache()
+    disable_pin()
+    clear_totp_cache()
+    TOTP_SUBSCRIPTIONS.clear()
     with KV() as kv:
-        kv.delete_partial("sealed")
-        kv.delete_partial("bw")
+        kv.clear_namespace("sealed")
+        kv.clear_namespace("bw")
 
         response = bitwarden_logout()
         if not response.success:
@@ -590,7 +966,8 @@ class SyncTrashItems(Event):
         if not encryption_key:
             return ListItemsResult(success=False, items=[])
 
-        session_key = get_session_key(encryption_key)
+        epoch = metadata.get("epoch", SESSION_EPOCH)
+        session_key = get_session_key(encryption_key, epoch)
         if not session_key:
             return ListItemsResult(success=False, items=[])
 
@@ -630,7 +1007,7 @@ class SyncTrashItems(Event):
                 )
 
         response = ListItemsResult(success=True, items=sorted(parsed_items, key=lambda x: (not x.favorite, x.name)))
-        save_encrypted(encryption_key, BWKeys.LIST_TRASH_ITEMS, asdict(response))
+        save_item_records(encryption_key, BWKeys.TRASH_ITEMS, BWKeys.LIST_TRASH_ITEMS, response, epoch)
         return response
 
 
@@ -642,20 +1019,15 @@ get_event_dispatcher().register_event(SyncTrashItems(id="sync-trash-items"))
 @crash_reporter
 @dataclass_to_dict
 def list_trash(encryption_key: str) -> ListItemsResult:
-    get_event_dispatcher().schedule(event_id="sync-trash-items", metadata={"encryption_key": encryption_key})
-
-    items = get_encrypted(encryption_key, BWKeys.LIST_TRASH_ITEMS)
-    if not items:
-        return ListItemsResult(success=True, items=[])
+    schedule_session_event("sync-trash-items", encryption_key)
 
-    parsed_items = from_dict(ListItemsResult, items, DACITE_CONFIG)
-    return parsed_items
+    return load_item_records(encryption_key, BWKeys.TRASH_ITEMS, BWKeys.LIST_TRASH_ITEMS)
 
 
 @crash_reporter
 @dataclass_to_dict
 def refresh_trash(encryption_key: str) -> StandardBitwardenResponse:
-    get_event_dispatcher().schedule(event_id="sync-trash-items", metadata={"encryption_key": encryption_key})
+    schedule_session_event("sync-trash-items", encryption_key)
     return StandardBitwardenResponse(success=True)
 
 
@@ -667,8 +1039,8 @@ def trash_item(encryption_key: str, item_id: str) -> StandardBitwardenResponse:
         return StandardBitwardenResponse(success=False, message="Not logged in")
 
     result = bitwarden_delete_item(session_key, item_id)
-    get_event_dispatcher().schedule(event_id="sync-trash-items", metadata={"encryption_key": encryption_key})
-    get_event_dispatcher().schedule(event_id="sync-items", metadata={"encryption_key": encryption_key})
+    schedule_session_event("sync-trash-items", encryption_key)
+    schedule_session_event("sync-items", encryption_key)
     if result.success:
         return StandardBitwardenResponse(success=True)
     else:
@@ -683,7 +1055,7 @@ def delete_item(encryption_key: str, item_id: str) -> StandardBitwardenResponse:
         return StandardBitwardenResponse(success=False, message="Not logged in")
 
     result = bitwarden_delete_item(session_key, item_id, permanent=True)
-    get_event_dispatcher().schedule(event_id="sync-trash-items", metadata={"encryption_key": encryption_key})
+    schedule_session_event("sync-trash-items", encryption_key)
     if result.success:
         return StandardBitwardenResponse(success=True)
     else:
@@ -698,8 +1070,8 @@ def restore_item(encryption_key: str, item_id: str) -> StandardBitwardenResponse
         return StandardBitwardenResponse(success=False, message="Not logged in")
 
     result = bitwarden_restore_item(session_key, item_id)
-    get_event_dispatcher().schedule(event_id="sync-trash-items", metadata={"encryption_key": encryption_key})
-    get_event_dispatcher().schedule(event_id="sync-items", metadata={"encryption_key": encryption_key})
+    schedule_session_event("sync-trash-items", encryption_key)
+    schedule_session_event("sync-items", encryption_key)
     if result.success:
         return StandardBitwardenResponse(success=True)
     else:
@@ -709,20 +1081,15 @@ def restore_item(encryption_key: str, item_id: str) -> StandardBitwardenResponse
 @crash_reporter
 @dataclass_to_dict
 def list_folders(encryption_key: str) -> ListFolderResult:
-    get_event_dispatcher().schedule(event_id="sync-folders", metadata={"encryption_key": encryption_key})
-
-    items = get_encrypted(encryption_key, BWKeys.LIST_FOLDERS)
-    if not items:
-        return ListFolderResult(success=True, folders=[])
+    schedule_session_event("sync-folders", encryption_key)
 
-    parsed_items = from_dict(ListFolderResult, items, DACITE_CONFIG)
-    return parsed_items
+    return load_folders(encryption_key)
 
 
 @crash_reporter
 @dataclass_to_dict
 def refresh_folders(encryption_key: str) -> StandardBitwardenResponse:
-    get_event_dispatcher().schedule(event_id="sync-folders", metadata={"encryption_key": encryption_key})
+    schedule_session_event("sync-folders", encryption_key)
     return StandardBitwardenResponse(success=True)
 
 
@@ -738,7 +1105,7 @@ def add_folder(encryption_key: str, name: str) -> StandardBitwardenResponse:
         session_code=session_key,
         name=name,
     )
-    get_event_dispatcher().schedule(event_id="sync-folders", metadata={"encryption_key": encryption_key})
+    schedule_session_event("sync-folders", encryption_key)
     if result.success:
         return StandardBitwardenResponse(success=True)
     else:
@@ -754,7 +1121,7 @@ def delete_folder(encryption_key: str, folder_id: str) -> StandardBitwardenRespo
         return StandardBitwardenResponse(success=False, message="Not logged in")
 
     result = bitwarden_delete_folder(session_key, folder_id)
-    get_event_dispatcher().schedule(event_id="sync-folders", metadata={"encryption_key": encryption_key})
+    schedule_session_event("sync-folders", encryption_key)
     if result.success:
         return StandardBitwardenResponse(success=True)
     else:
@@ -770,7 +1137,7 @@ def edit_folder(encryption_key: str, folder_id: str, name: str) -> StandardBitwa
         return StandardBitwardenResponse(success=False, message="Not logged in")
 
     result = bitwarden_edit_folder(session_key, folder_id, name)
-    get_event_dispatcher().schedule(event_id="sync-folders", metadata={"encryption_key": encryption_key})
+    schedule_session_event("sync-folders", encryption_key)
     if result.success:
         return StandardBitwardenResponse(success=True)
     else:
@@ -786,7 +1153,8 @@ class SyncFolderItems(Event):
         if not encryption_key or not folder_id:
             return ListItemsResult(success=False, items=[])
 
-        session_key = get_session_key(encryption_key)
+        epoch = metadata.get("epoch", SESSION_EPOCH)
+        session_key = get_session_key(encryption_key, epoch)
         if not session_key:
             return ListItemsResult(success=False, items=[])
 
@@ -826,7 +1194,9 @@ class SyncFolderItems(Event):
                 )
 
         response = ListItemsResult(success=True, items=sorted(parsed_items, key=lambda x: (not x.favorite, x.name)))
-        save_encrypted(encryption_key, f"{BWKeys.LIST_FOLDER_ITEMS}.{folder_id}", asdict(response))
+        with SESSION_LOCK:
+            if epoch == SESSION_EPOCH:
+                save_encrypted(encryption_key, f"{BWKeys.LIST_FOLDER_ITEMS}.{folder_id}", to_qml(response))
         return response
 
 
@@ -836,9 +1206,7 @@ get_event_dispatcher().register_event(SyncFolderItems(id="sync-folder-items"))
 @crash_reporter
 @dataclass_to_dict
 def list_folder(encryption_key: str, folder_id: str) -> ListItemsResult:
-    get_event_dispatcher().schedule(
-        event_id="sync-folder-items", metadata={"encryption_key": encryption_key, "folder_id": folder_id}
-    )
+    schedule_session_event("sync-folder-items", encryption_key, folder_id=folder_id)
 
     items = get_encrypted(encryption_key, f"{BWKeys.LIST_FOLDER_ITEMS}.{folder_id}")
     if not items:
@@ -851,7 +1219,5 @@ def list_folder(encryption_key: str, folder_id: str) -> ListItemsResult:
 @crash_reporter
 @dataclass_to_dict
 def refresh_folder(encryption_key: str, folder_id: str) -> StandardBitwardenResponse:
-    get_event_dispatcher().schedule(
-        event_id="sync-folder-items", metadata={"encryption_key": encryption_key, "folder_id": folder_id}
-    )
+    schedule_session_event("sync-folder-items", encryption_key, folder_id=folder_id)
     return StandardBitwardenResponse(success=True)
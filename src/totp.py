@@ -15,32 +15,166 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import base64
+import functools
 import hashlib
 import hmac
 import struct
 import time
+from dataclasses import dataclass
+from urllib.parse import parse_qs, unquote, urlparse
 
+STEAM_ALPHABET = "23456789BCDFGHJKMNPQRTVWXY"
+SECRET_CACHE_SIZE = 64
+DIGESTS = {
+    "SHA1": hashlib.sha1,
+    "SHA256": hashlib.sha256,
+    "SHA512": hashlib.sha512,
+}
 
-def generate_hotp(secret, counter, digits=6, digest=hashlib.sha1):
-    counter_bytes = struct.pack(">Q", counter)
-    hmac_digest = hmac.new(secret, counter_bytes, digest).digest()
+
+@dataclass(frozen=True)
+class TotpParams:
+    secret: bytes
+    period: int = 30
+    digits: int = 6
+    algorithm: str = "SHA1"
+    steam: bool = False
+
+
+def _truncate(hmac_digest):
     offset = hmac_digest[-1] & 0x0F
     truncated = hmac_digest[offset : offset + 4]
-    code = struct.unpack(">I", truncated)[0] & 0x7FFFFFFF
+    return struct.unpack(">I", truncated)[0] & 0x7FFFFFFF
+
+
+def _steam_code(code, digits):
+    chars = []
+    for _ in range(digits):
+        code, index = divmod(code, len(STEAM_ALPHABET))
+        chars.append(STEAM_ALPHABET[index])
+    return "".join(chars)
+
+
+@functools.lru_cache(maxsize=SECRET_CACHE_SIZE)
+def _keyed_hmac(secret, digest):
+    return hmac.new(secret, digestmod=digest)
+
+
+def _hmac_digest(secret, counter, digest):
+    mac = _keyed_hmac(bytes(secret), digest).copy()
+    mac.update(struct.pack(">Q", counter))
+    return mac.digest()
+
+
+def generate_hotp(secret, counter, digits=6, digest=hashlib.sha1):
+    code = _truncate(_hmac_digest(secret, counter, digest))
     code = code % (10**digits)
     return str(code).zfill(digits)
 
 
+def generate_steam_code(secret, counter, digits=5, digest=hashlib.sha1):
+    code = _truncate(_hmac_digest(secret, counter, digest))
+    return _steam_code(code, digits)
+
+
+@functools.lru_cache(maxsize=SECRET_CACHE_SIZE)
+def _decode_base32(secret):
+    secret = secret.replace(" ", "").replace("-", "").upper()
+    padding = 8 - len(secret) % 8
+    if padding != 8:
+        secret += "=" * padding
+    return base64.b32decode(secret)
+
+
 def _decode_secret(secret):
     if isinstance(secret, str):
-        secret = secret.replace(" ", "").replace("-", "").upper()
-        padding = 8 - len(secret) % 8
-        if padding != 8:
-            secret += "=" * padding
-        return base64.b32decode(secret)
+        return _decode_base32(secret)
     return secret
 
 
+def _positive_int(query, name, default):
+    values = query.get(name)
+    if not values:
+        return default
+    value = int(values[0])
+    if value <= 0:
+        raise ValueError(f"invalid {name}: {value}")
+    return value
+
+
+@functools.lru_cache(maxsize=SECRET_CACHE_SIZE)
+def parse_totp_secret(secret):
+    secret = secret.strip()
+    lowered = secret.lower()
+
+    if lowered.startswith("steam://"):
+        return TotpParams(secret=_decode_secret(secret[len("steam://") :]), digits=5, steam=True)
+
+    if not lowered.startswith("otpauth://"):
+        return TotpParams(secret=_decode_secret(secret))
+
+    uri = urlparse(secret)
+    if uri.netloc.lower() != "totp":
+        raise ValueError(f"unsupported otpauth type: {uri.netloc}")
+
+    query = parse_qs(uri.query)
+    if not query.get("secret"):
+        raise ValueError("otpauth uri without secret")
+
+    algorithm = query.get("algorithm", ["SHA1"])[0].upper()
+    if algorithm not in DIGESTS:
+        raise ValueError(f"unsupported algorithm: {algorithm}")
+
+    issuer = query.get("issuer", [unquote(uri.path.lstrip("/")).split(":")[0]])[0]
+    encoder = query.get("encoder", [""])[0].lower()
+    steam = encoder == "steam" or issuer.lower() == "steam"
+
+    return TotpParams(
+        secret=_decode_secret(query["secret"][0]),
+        period=_positive_int(query, "period", 30),
+        digits=_positive_int(query, "digits", 5 if steam else 6),
+        algorithm=algorithm,
+        steam=steam,
+    )
+
+
+def generate_code(params, counter):
+    digest = DIGESTS[params.algorithm]
+    if params.steam:
+        return generate_steam_code(params.secret, counter, params.digits, digest)
+    return generate_hotp(params.secret, counter, params.digits, digest)
+
+
+def generate_codes(params, counter, count):
+    digest = DIGESTS[params.algorithm]
+    prototype = _keyed_hmac(params.secret, digest)
+    codes = []
+    for current in range(counter, counter + count):
+        mac = prototype.copy()
+        mac.update(struct.pack(">Q", current))
+        code = _truncate(mac.digest())
+        if params.steam:
+            codes.append(_steam_code(code, params.digits))
+        else:
+            codes.append(str(code % (10**params.digits)).zfill(params.digits))
+    return codes
+
+
+def clear_totp_cache():
+    _keyed_hmac.cache_clear()
+    _decode_base32.cache_clear()
+    parse_totp_secret.cache_clear()
+
+
+def get_totp_window(secret, now=None):
+    params = parse_totp_secret(secret)
+    current_time = int(time.time() if now is None else now)
+    counter = current_time // params.period
+    seconds_remaining = params.period - (current_time % params.period)
+    code, next_code = generate_codes(params, counter, 2)
+    return params, code, next_code, seconds_remaining
+
+
 def get_totp_state(secret, time_step=30, digits=6, digest=hashlib.sha1):
     secret_bytes = _decode_secret(secret)
     current_time = int(time.time())
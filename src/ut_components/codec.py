@@ -0,0 +1,264 @@
+"""
+Copyright (C) 2025  Brenno Flávio de Almeida
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; version 3.
+
+ut-components is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import json
+import struct
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Tuple, Union
+
+# Type bytes of the binary codec. Stored data depends on them, so never
+# renumber or reuse one.
+_NONE = 0x00
+_FALSE = 0x01
+_TRUE = 0x02
+_INT = 0x03
+_FLOAT = 0x04
+_STR = 0x05
+_BYTES = 0x06
+_LIST = 0x07
+_DICT = 0x08
+
+_DOUBLE = struct.Struct(">d")
+
+
+@dataclass(frozen=True)
+class Codec:
+    """
+    A way of turning values into what KV stores in its value column.
+
+    The tag is stored next to every value so it can be decoded without
+    knowing how it was written; tags must never be reused.
+
+    Attributes:
+        tag (int): Stored in the codec column of the kv table.
+        name (str): Name used to pick the codec, e.g. KV.put(..., codec="binary").
+        encode (Callable[[Any], Union[str, bytes]]): Turns a value into TEXT
+            (str) or BLOB (bytes).
+        decode (Callable[[Union[str, bytes]], Any]): The inverse of encode.
+    """
+
+    tag: int
+    name: str
+    encode: Callable[[Any], Union[str, bytes]]
+    decode: Callable[[Union[str, bytes]], Any]
+
+
+def _encode_text(value: Any) -> str:
+    if not isinstance(value, str):
+        raise TypeError(f"text codec only stores str, got {type(value).__name__}")
+    return value
+
+
+def _encode_blob(value: Any) -> bytes:
+    if not isinstance(value, (bytes, bytearray, memoryview)):
+        raise TypeError(f"blob codec only stores bytes, got {type(value).__name__}")
+    return bytes(value)
+
+
+def _write_varint(number: int, out: bytearray) -> None:
+    while number > 0x7F:
+        out.append((number & 0x7F) | 0x80)
+        number >>= 7
+    out.append(number)
+
+
+def _read_varint(data: bytes, position: int) -> Tuple[int, int]:
+    number = 0
+    shift = 0
+    while True:
+        byte = data[position]
+        position += 1
+        number |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return number, position
+        shift += 7
+
+
+def _pack(value: Any, out: bytearray) -> None:
+    cls = value.__class__
+    if value is None:
+        out.append(_NONE)
+    elif cls is bool:
+        out.append(_TRUE if value else _FALSE)
+    elif isinstance(value, int):
+        out.append(_INT)
+        # zigzag, so small negative numbers stay short
+        _write_varint(value * 2 if value >= 0 else -value * 2 - 1, out)
+    elif isinstance(value, float):
+        out.append(_FLOAT)
+        out += _DOUBLE.pack(value)
+    elif isinstance(value, str):
+        data = value.encode("utf-8")
+        out.append(_STR)
+        _write_varint(len(data), out)
+        out += data
+    elif isinstance(value, (bytes, bytearray, memoryview)):
+        data = bytes(value)
+        out.append(_BYTES)
+        _write_varint(len(data), out)
+        out += data
+    elif isinstance(value, (list, tuple)):
+        out.append(_LIST)
+        _write_varint(len(value), out)
+        for item in value:
+            _pack(item, out)
+    elif isinstance(value, dict):
+        out.append(_DICT)
+        _write_varint(len(value), out)
+        for key, item in value.items():
+            if not isinstance(key, str):
+                raise TypeError(f"binary codec only stores str dict keys, got {type(key).__name__}")
+            data = key.encode("utf-8")
+            _write_varint(len(data), out)
+            out += data
+            _pack(item, out)
+    else:
+        raise TypeError(f"binary codec can't store {cls.__name__}")
+
+
+def _unpack(data: bytes, position: int) -> Tuple[Any, int]:
+    kind = data[position]
+    position += 1
+    if kind == _STR:
+        length, position = _read_varint(data, position)
+        return data[position : position + length].decode("utf-8"), position + length
+    elif kind == _INT:
+        number, position = _read_varint(data, position)
+        return (number >> 1) ^ -(number & 1), position
+    elif kind == _DICT:
+        count, position = _read_varint(data, position)
+        result = {}
+        for _ in range(count):
+            length, position = _read_varint(data, position)
+            key = data[position : position + length].decode("utf-8")
+            result[key], position = _unpack(data, position + length)
+        return result, position
+    elif kind == _LIST:
+        count, position = _read_varint(data, position)
+        items = []
+        for _ in range(count):
+            item, position = _unpack(data, position)
+            items.append(item)
+        return items, position
+    elif kind == _NONE:
+        return None, position
+    elif kind == _TRUE:
+        return True, position
+    elif kind == _FALSE:
+        return False, position
+    elif kind == _FLOAT:
+        return _DOUBLE.unpack_from(data, position)[0], position + 8
+    elif kind == _BYTES:
+        length, position = _read_varint(data, position)
+        return data[position : position + length], position + length
+    raise ValueError(f"unknown binary codec type byte {kind:#x}")
+
+
+def encode_binary(value: Any) -> bytes:
+    """
+    Encode a value with the compact binary codec.
+
+    Every value is a type byte followed by its payload: integers as zigzag
+    varints, floats as 8-byte doubles, strings and bytes as a varint length
+    and the raw data, lists and dicts as a varint count and their items.
+    There are no quotes, escapes or separators, so dicts and lists of short
+    strings and small numbers come out noticeably smaller than JSON, and
+    bytes can be nested inside them without base64. Tuples decode as lists
+    and dict keys must be strings, as with JSON.
+
+    Args:
+        value (Any): None, bool, int, float, str, bytes, or lists, tuples
+            and dicts of those.
+
+    Returns:
+        bytes: The encoded value.
+
+    Raises:
+        TypeError: If the value, or something nested in it, can't be encoded.
+
+    Example:
+        >>> from src.ut_components.codec import decode_binary, encode_binary
+        >>>
+        >>> data = encode_binary({"id": 7, "tags": ["a", "b"]})
+        >>> len(data)  # 29 bytes as JSON
+        20
+        >>> decode_binary(data)
+        {'id': 7, 'tags': ['a', 'b']}
+    """
+    out = bytearray()
+    _pack(value, out)
+    return bytes(out)
+
+
+def decode_binary(data: bytes) -> Any:
+    """
+    Decode a value written by encode_binary().
+
+    Args:
+        data (bytes): The encoded value.
+
+    Returns:
+        Any: The decoded value.
+
+    Raises:
+        ValueError: If the data is not valid binary codec output.
+    """
+    try:
+        value, position = _unpack(data, 0)
+    except IndexError:
+        raise ValueError("truncated binary codec data") from None
+    if position != len(data):
+        raise ValueError("trailing data after binary codec value")
+    return value
+
+
+# Tags are stored in the codec column of every kv row written since codecs
+# were added; rows with no tag hold the old {"value": ...} JSON wrapper, or raw
+# bytes if stored as a BLOB.
+CODECS: Dict[str, Codec] = {
+    "json": Codec(tag=1, name="json", encode=json.dumps, decode=json.loads),
+    "text": Codec(tag=2, name="text", encode=_encode_text, decode=str),
+    "blob": Codec(tag=3, name="blob", encode=_encode_blob, decode=bytes),
+    "binary": Codec(tag=4, name="binary", encode=encode_binary, decode=decode_binary),
+}
+CODECS_BY_TAG: Dict[int, Codec] = {codec.tag: codec for codec in CODECS.values()}
+
+
+def pick_codec(value: Any) -> Codec:
+    """
+    Pick the codec KV uses when neither the call nor the namespace chose one.
+
+    Strings are stored as plain text and bytes as BLOBs, so neither is
+    escaped, base64-encoded or parsed on the way back. Everything else is
+    stored as JSON.
+
+    Args:
+        value (Any): The value about to be stored.
+
+    Returns:
+        Codec: The text, blob or json codec.
+
+    Example:
+        >>> pick_codec("hello").name
+        'text'
+        >>> pick_codec({"a": 1}).name
+        'json'
+    """
+    if isinstance(value, str):
+        return CODECS["text"]
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return CODECS["blob"]
+    return CODECS["json"]
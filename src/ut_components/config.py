@@ -15,6 +15,7 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
 import os
+from typing import Optional
 
 from . import APP_NAME_
 
@@ -100,6 +101,50 @@ def get_cache_path() -> str:
     return os.path.join(xdg_cache, APP_NAME_)
 
 
+def get_runtime_path() -> Optional[str]:
+    """
+    Get the XDG runtime directory path for the application.
+
+    This function returns the per-user runtime directory where the
+    application can keep small files that must not outlive the session.
+    The XDG Base Directory specification requires it to be owned by the
+    user, not readable by anyone else, and removed when the user logs out
+    or the device restarts, which on Ubuntu Touch means a tmpfs under
+    /run/user. Nothing stored there ever reaches flash.
+
+    Unlike the other paths there is no fallback: if XDG_RUNTIME_DIR is
+    not set, no directory with those guarantees exists and None is
+    returned, so callers can refuse to store the data at all.
+
+    Returns:
+        Optional[str]: The absolute path to the application's runtime
+            directory, typically /run/user/{uid}/{app_name}, or None if
+            XDG_RUNTIME_DIR is not set.
+
+    Raises:
+        AssertionError: If setup() has not been called to initialize APP_NAME_
+
+    Example:
+        >>> from src.ut_components import setup
+        >>> from src.ut_components.config import get_runtime_path
+        >>>
+        >>> setup(app_name="myapp.example")
+        >>>
+        >>> runtime_dir = get_runtime_path()
+        >>> print(runtime_dir)
+        /run/user/32011/myapp.example
+        >>>
+        >>> # Keep session-only state off flash
+        >>> if runtime_dir:
+        ...     lock_file = os.path.join(runtime_dir, "session.lock")
+    """
+    assert APP_NAME_
+    xdg_runtime = os.environ.get("XDG_RUNTIME_DIR")
+    if not xdg_runtime:
+        return None
+    return os.path.join(xdg_runtime, APP_NAME_)
+
+
 def get_app_data_path() -> str:
     """
     Get the application's installation directory path.
@@ -20,17 +20,20 @@ import time
 import traceback
 import warnings
 from abc import ABC, abstractmethod
-from dataclasses import asdict, dataclass, is_dataclass
+from dataclasses import dataclass, is_dataclass
 from datetime import datetime, timedelta
 from math import ceil
 from typing import Dict, List, Optional, Tuple, Union
 
 import pyotherside
 
-from .utils import enum_to_str
+from .utils import to_qml
 
 EVENT_DISPATCHER = None
 
+PRIORITY_NORMAL = 0
+PRIORITY_LOW = 10
+
 
 class Event(ABC):
     """
@@ -51,6 +54,9 @@ class Event(ABC):
             automatically re-scheduled at this interval by the dispatcher.
         next_execution_date (Optional[datetime]): Internal tracking for when
             the event should next be automatically enqueued.
+        align_to_interval (bool): If True, recurring executions happen on
+            wall-clock multiples of execution_interval (e.g. :00 and :30 for a
+            30 second interval) instead of counting from the previous run.
 
     Example:
         >>> from datetime import timedelta
@@ -81,7 +87,13 @@ class Event(ABC):
         ...         return {"success": True}
     """
 
-    def __init__(self, id: str, execution_interval: Optional[timedelta] = None) -> None:
+    def __init__(
+        self,
+        id: str,
+        execution_interval: Optional[timedelta] = None,
+        align_to_interval: bool = False,
+        priority: int = PRIORITY_NORMAL,
+    ) -> None:
         """
         Initialize a new Event instance.
 
@@ -93,6 +105,14 @@ class Event(ABC):
             execution_interval (timedelta): Time interval between automatic
                 executions. Set to None for events that should only be
                 triggered manually via schedule().
+            align_to_interval (bool): Run recurring executions exactly on
+                wall-clock boundaries of execution_interval, counted from the
+                Unix epoch. Useful for work tied to fixed time windows, such
+                as TOTP codes. Defaults to False.
+            priority (int): Among the events that are due, lower values run
+                first. Use PRIORITY_LOW for background work, such as warming
+                caches, that should never delay events the user is waiting
+                for. Defaults to PRIORITY_NORMAL.
 
         Example:
             >>> from datetime import timedelta
@@ -110,6 +130,8 @@ class Event(ABC):
         self.id: str = id
         self.execution_interval: Optional[timedelta] = execution_interval
         self.next_execution_date: Optional[datetime] = None
+        self.align_to_interval: bool = align_to_interval
+        self.priority: int = priority
 
     @abstractmethod
     def trigger(self, metadata: Optional[Dict]) -> Union[object, Dict, None]:
@@ -185,6 +207,8 @@ class EventDispatcher:
     The EventDispatcher manages the lifecycle of events: registration, scheduling,
     and execution. It uses a min-heap priority queue to efficiently process events
     in chronological order, supporting both one-time and recurring events.
+    When several events are due at once, the ones with the lowest priority
+    value run first, so background work never delays interactive events.
 
     Events can be triggered in two ways:
     1. Automatically: Events with an execution_interval are re-scheduled
@@ -197,6 +221,7 @@ class EventDispatcher:
 
     Features:
         - Priority queue for efficient chronological event processing
+        - Per-event priority for low-priority background jobs
         - Support for recurring events with configurable intervals
         - Manual event scheduling with optional delays
         - Metadata support for passing data to event handlers
@@ -392,27 +417,51 @@ class EventDispatcher:
         heapq.heappush(self._queue, (heap_key, self._counter, queued_event))
         self._counter += 1
 
+    def _next_boundary(self, now: datetime, interval: timedelta) -> datetime:
+        interval_ms = ceil(interval.total_seconds() * 1000)
+        boundary_ms = (self._heap_key(now) // interval_ms + 1) * interval_ms
+        return datetime.fromtimestamp(boundary_ms / 1000)
+
     def _enqueue(self):
-        for event in self._events.values():
+        for event in list(self._events.values()):
             if event.execution_interval:
-                if not event.next_execution_date or event.next_execution_date < datetime.now():
-                    event.next_execution_date = datetime.now() + event.execution_interval
-                    self.schedule(event.id)
+                now = datetime.now()
+                if not event.next_execution_date or event.next_execution_date < now:
+                    if event.align_to_interval:
+                        event.next_execution_date = self._next_boundary(now, event.execution_interval)
+                        self.schedule(event.id, execution_interval=event.next_execution_date - now)
+                    else:
+                        event.next_execution_date = now + event.execution_interval
+                        self.schedule(event.id)
+
+    def _sleep_seconds(self, interval_seconds: float) -> float:
+        if not self._queue:
+            return interval_seconds
+        until_next = (self._queue[0][0] - self._heap_key(datetime.now())) / 1000
+        return max(0.0, min(interval_seconds, until_next))
+
+    def _pop_due(self) -> Optional[QueuedEvent]:
+        now = self._heap_key(datetime.now())
+        due = [entry for entry in self._queue if entry[0] <= now]
+        if not due:
+            return None
+        entry = min(due, key=lambda entry: (entry[2].event.priority, entry[0], entry[1]))
+        self._queue.remove(entry)
+        heapq.heapify(self._queue)
+        return entry[2]
 
     def _process(self):
-        while self._queue:
-            heap_key, counter, queued_event = heapq.heappop(self._queue)
-            if heap_key <= self._heap_key(datetime.now()):
-                result = queued_event.event.trigger(queued_event.metadata)
-                if result:
-                    if is_dataclass(result):
-                        dict_result: Dict = enum_to_str(asdict(result))  # type: ignore
-                    else:
-                        dict_result = result  # type: ignore
-                    pyotherside.send(queued_event.event.id, dict_result)
-            else:
-                heapq.heappush(self._queue, (heap_key, counter, queued_event))
+        while True:
+            queued_event = self._pop_due()
+            if queued_event is None:
                 break
+            result = queued_event.event.trigger(queued_event.metadata)
+            if result:
+                if is_dataclass(result):
+                    dict_result: Dict = to_qml(result)
+                else:
+                    dict_result = result  # type: ignore
+                pyotherside.send(queued_event.event.id, dict_result)
 
     def _run(self, interval_seconds: float = 0.5):
         self.register_event(ErrorEvent(id="error-event"))
@@ -422,7 +471,7 @@ class EventDispatcher:
             try:
                 self._enqueue()
                 self._process()
-                time.sleep(interval_seconds)
+                time.sleep(self._sleep_seconds(interval_seconds))
             except Exception as e:
                 self.schedule("error-event", metadata={"error": str(e), "traceback": traceback.format_exc()})
                 traceback.print_exc()
@@ -435,8 +484,9 @@ class EventDispatcher:
         allowing the main thread to continue execution.
 
         Args:
-            interval_seconds (float): Time in seconds to sleep between
-                processing iterations. Defaults to 0.5.
+            interval_seconds (float): Maximum time in seconds to sleep between
+                processing iterations. The loop wakes earlier when a queued
+                event is due sooner. Defaults to 0.5.
 
         Example:
             >>> dispatcher = get_event_dispatcher()
@@ -14,14 +14,870 @@ You should have received a copy of the GNU General Public License
 along with this program.  If not, see <http://www.gnu.org/licenses/>.
 """
 
+import atexit
+import itertools
 import json
 import os
 import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from dataclasses import dataclass, replace
 from datetime import datetime, timedelta
-from typing import Any, List, Optional, Tuple
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple, Union
 
+from .codec import CODECS, CODECS_BY_TAG, pick_codec
 from .config import get_config_path
 
+KV_POOL_SIZE = 4
+# Rows per executemany() call or IN (...) query; SQLite builds before 3.32
+# allow at most 999 bound variables per statement.
+KV_BATCH_SIZE = 500
+# Expired rows deleted per transaction, and at most this many batches and
+# freed pages returned to the filesystem per reap_expired() call.
+KV_REAP_BATCH_SIZE = 200
+KV_REAP_MAX_BATCHES = 25
+KV_VACUUM_PAGES = 512
+AUTO_VACUUM_INCREMENTAL = 2
+# Seconds between background flushes of write-behind keys; the flush also
+# starts early once this many writes are pending.
+WRITE_BEHIND_INTERVAL = 2.0
+WRITE_BEHIND_MAX_PENDING = KV_BATCH_SIZE
+# Size-limited namespaces are checked on the first write and then every this
+# many writes; when over a limit, rows are evicted until the namespace is back
+# under this fraction of it, so eviction runs in batches rather than per write.
+KV_EVICT_CHECK_WRITES = 32
+KV_EVICT_LOW_WATERMARK = 0.9
+
+# Applied to every new connection, in order. WAL lets readers on the QML
+# thread run while the dispatcher thread writes; with synchronous=NORMAL a
+# commit only appends to the WAL, and a power loss can at worst drop the last
+# few commits, never corrupt the database.
+PRAGMA_PROFILES: Dict[str, Dict[str, Union[str, int]]] = {
+    "default": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -4096,
+        "mmap_size": 32 * 1024 * 1024,
+        "temp_store": "MEMORY",
+    },
+    "durable": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "FULL",
+        "cache_size": -4096,
+        "mmap_size": 32 * 1024 * 1024,
+    },
+    "low_memory": {
+        "busy_timeout": 5000,
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -512,
+        "mmap_size": 0,
+    },
+    # SQLite's own defaults: rollback journal, fsync on every commit
+    "legacy": {
+        "busy_timeout": 5000,
+        "journal_mode": "DELETE",
+        "synchronous": "FULL",
+    },
+}
+PRAGMAS: Dict[str, Union[str, int]] = PRAGMA_PROFILES["default"]
+# Bumped on every set_pragma_profile(); pooled connections opened with an older
+# profile are closed instead of being reused.
+_PRAGMAS_VERSION = 0
+
+
+# Per-thread connection with its handle refcount and transaction depth.
+class _Connection:
+    def __init__(self, conn: sqlite3.Connection, pragmas_version: int) -> None:
+        self.conn = conn
+        self.pragmas_version = pragmas_version
+        self.handles = 0
+        self.transaction_depth = 0
+        # written inside the open transaction; dropped from READ_CACHE when it ends
+        self.touched_keys: Set[str] = set()
+        self.touched_prefixes: Set[str] = set()
+
+
+# Idle connections per database path, shared by all threads.
+_IDLE_CONNECTIONS: Dict[str, List[_Connection]] = {}
+_POOL_LOCK = threading.Lock()
+# Database paths whose schema was already created by this process.
+_SCHEMA_READY: Set[str] = set()
+# Per thread {path: _Connection}, so nested KV() handles on the same thread
+# share one connection and see each other's writes.
+_THREAD_STATE = threading.local()
+
+
+_MISSING = object()
+_IMMUTABLE_TYPES = (str, int, float, bool, type(None), bytes)
+
+
+@dataclass
+class ReadCacheStats:
+    """
+    Counters of the process-wide KV read cache.
+
+    Attributes:
+        hits (int): get() calls answered from memory.
+        misses (int): get() calls that went to SQLite.
+        evictions (int): Entries dropped to stay within max_bytes.
+        entries (int): Entries currently cached.
+        size (int): Approximate bytes currently cached.
+        max_bytes (int): Configured bound; 0 means the cache is disabled.
+    """
+
+    hits: int
+    misses: int
+    evictions: int
+    entries: int
+    size: int
+    max_bytes: int
+
+
+class _ReadCache:
+    # LRU of raw stored values by (database path, key), bounded by the size of
+    # keys and values. Decoded values are kept only for immutable types, so
+    # callers never share a dict or list with the cache. Every write bumps
+    # generation. Readers and writers read it before touching SQLite and only
+    # store what they read or wrote if no other write happened meanwhile, so
+    # a slow reader, or a writer whose commit was overtaken by another one,
+    # can't put back a stale value; a writer that loses drops the key instead.
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.entries: "OrderedDict[Tuple[str, str], List[Any]]" = OrderedDict()
+        self.max_bytes = 0
+        self.size = 0
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def lookup(self, path: str, key: str, now_seconds: int) -> Optional[List[Any]]:
+        with self.lock:
+            entry = self.entries.get((path, key))
+            if entry is None:
+                self.misses += 1
+                return None
+            ttl = entry[3]
+            if ttl is not None and ttl <= now_seconds:
+                self._drop((path, key))
+                self.misses += 1
+                return None
+            self.entries.move_to_end((path, key))
+            self.hits += 1
+            return entry
+
+    def store(
+        self,
+        path: str,
+        key: str,
+        raw: Union[str, bytes],
+        tag: Optional[int],
+        ttl: Optional[int],
+        generation: int,
+        write: bool = False,
+    ) -> None:
+        with self.lock:
+            current = self.generation
+            if write:
+                self.generation += 1
+            self._drop((path, key))
+            if generation != current:
+                return
+            size = len(key) + len(raw)
+            if not self.max_bytes or size > self.max_bytes // 4:
+                return
+            self.entries[(path, key)] = [raw, tag, _MISSING, ttl, size]
+            self.size += size
+            while self.size > self.max_bytes:
+                _, evicted = self.entries.popitem(last=False)
+                self.size -= evicted[-1]
+                self.evictions += 1
+
+    def invalidate(self, path: str, keys: Iterable[str] = (), prefixes: Iterable[str] = ()) -> None:
+        with self.lock:
+            self.generation += 1
+            for key in keys:
+                self._drop((path, key))
+            prefixes = tuple(prefixes)
+            if prefixes:
+                for cache_key in [k for k in self.entries if k[0] == path and k[1].startswith(prefixes)]:
+                    self._drop(cache_key)
+
+    def clear(self) -> None:
+        with self.lock:
+            self.generation += 1
+            self.entries.clear()
+            self.size = 0
+
+    def _drop(self, cache_key: Tuple[str, str]) -> None:
+        entry = self.entries.pop(cache_key, None)
+        if entry is not None:
+            self.size -= entry[-1]
+
+
+READ_CACHE = _ReadCache()
+
+
+def set_read_cache_size(max_bytes: int) -> None:
+    """
+    Enable, resize or disable the process-wide read cache in front of KV.get().
+
+    With the cache enabled, get() answers repeated reads of hot keys from
+    memory instead of querying SQLite, and skips JSON decoding for strings,
+    numbers, booleans and bytes. put() and delete() update the cache after
+    they commit, delete_partial() and the bulk operations invalidate it, and
+    writes made inside transaction() are invalidated when the transaction
+    ends, so readers on other threads never see uncommitted data. Values
+    larger than a quarter of max_bytes are not cached.
+
+    Args:
+        max_bytes (int): Upper bound for the cached keys and values, in
+            bytes. 0 disables the cache and empties it. Disabled by default.
+
+    Example:
+        >>> from src.ut_components.kv import KV, read_cache_stats, set_read_cache_size
+        >>>
+        >>> set_read_cache_size(256 * 1024)
+        >>> with KV() as kv:
+        ...     kv.put("config.theme", "dark")
+        ...     kv.get("config.theme")  # served from memory
+        >>> read_cache_stats().hits
+        1
+    """
+    with READ_CACHE.lock:
+        READ_CACHE.max_bytes = max(0, int(max_bytes))
+    if not max_bytes:
+        READ_CACHE.clear()
+    else:
+        # shrink right away if needed
+        with READ_CACHE.lock:
+            while READ_CACHE.size > READ_CACHE.max_bytes:
+                _, evicted = READ_CACHE.entries.popitem(last=False)
+                READ_CACHE.size -= evicted[-1]
+                READ_CACHE.evictions += 1
+
+
+def read_cache_stats() -> ReadCacheStats:
+    """
+    Return the hit, miss and size counters of the KV read cache.
+
+    Returns:
+        ReadCacheStats: A snapshot of the counters.
+
+    Example:
+        >>> stats = read_cache_stats()
+        >>> print(stats.hits / max(1, stats.hits + stats.misses))
+    """
+    with READ_CACHE.lock:
+        return ReadCacheStats(
+            hits=READ_CACHE.hits,
+            misses=READ_CACHE.misses,
+            evictions=READ_CACHE.evictions,
+            entries=len(READ_CACHE.entries),
+            size=READ_CACHE.size,
+            max_bytes=READ_CACHE.max_bytes,
+        )
+
+
+# (encoded value, codec tag, ttl) as stored in the kv table
+_Row = Tuple[Union[str, bytes], Optional[int], Optional[int]]
+
+_NAMESPACE_CODECS: Dict[str, str] = {}
+# The namespace column holds the part of the key before its first ".", the
+# same as _namespace(); every insert goes through _INSERT_ROW to fill it in.
+_NAMESPACE_SQL = "substr({key}, 1, instr({key} || '.', '.') - 1)"
+# Milliseconds since the epoch, the unit of the accessed column.
+_NOW_MS_SQL = "CAST((julianday('now') - 2440587.5) * 86400000 AS INTEGER)"
+_INSERT_ROW = (
+    "INSERT OR REPLACE INTO kv (key, value, codec, ttl, namespace, accessed) "
+    f"VALUES (?1, ?2, ?3, ?4, {_NAMESPACE_SQL.format(key='?1')}, {_NOW_MS_SQL})"
+)
+_ROW_BYTES_SQL = "length(CAST(key AS BLOB)) + length(CAST(value AS BLOB))"
+
+
+def _namespace(key: str) -> str:
+    return key.partition(".")[0]
+
+
+def _stored(value: Optional[Union[str, bytes]], tag: Optional[int]) -> bool:
+    # Rows from before codecs count as missing when empty, as they always did.
+    return value is not None and (tag is not None or bool(value))
+
+
+def set_namespace_codec(namespace: str, codec: Optional[str]) -> None:
+    """
+    Choose the codec used for every key in a namespace.
+
+    The namespace of a key is the part before its first "."; "memoize" for
+    "memoize.abc.def". Calls that pass codec= explicitly still win. Values
+    already stored keep the codec they were written with and read back fine.
+
+    Args:
+        namespace (str): The namespace, without the trailing ".".
+        codec (Optional[str]): "json", "text", "blob" or "binary", or None
+            to go back to picking text, blob or json by value type.
+
+    Raises:
+        ValueError: If the codec name is unknown.
+
+    Example:
+        >>> from src.ut_components.kv import KV, set_namespace_codec
+        >>>
+        >>> set_namespace_codec("memoize", "binary")
+        >>> with KV() as kv:
+        ...     kv.put("memoize.f.args", {"value": [1, 2, 3]})  # stored as binary
+    """
+    if codec is None:
+        _NAMESPACE_CODECS.pop(namespace, None)
+        return
+    if codec not in CODECS:
+        raise ValueError(f"Unknown codec {codec!r}, expected one of {', '.join(CODECS)}")
+    _NAMESPACE_CODECS[namespace] = codec
+
+
+@dataclass(frozen=True)
+class NamespaceLimit:
+    """
+    Capacity of a namespace, see set_namespace_limit().
+
+    Attributes:
+        max_rows (Optional[int]): Most rows the namespace may hold.
+        max_bytes (Optional[int]): Most bytes of keys and values it may hold.
+        policy (str): "lru" evicts the least recently read or written rows
+            first, "lfu" the least often read ones, oldest first on ties.
+    """
+
+    max_rows: Optional[int] = None
+    max_bytes: Optional[int] = None
+    policy: str = "lru"
+
+
+@dataclass
+class EvictionStats:
+    """
+    Eviction counters of a size-limited namespace.
+
+    Attributes:
+        checks (int): Times the namespace size was checked.
+        runs (int): Checks that found it over a limit and evicted rows.
+        evicted_rows (int): Rows evicted so far.
+        evicted_bytes (int): Bytes of keys and values evicted so far.
+        rows (int): Rows in the namespace after the last check.
+        bytes (int): Bytes in the namespace after the last check.
+    """
+
+    checks: int = 0
+    runs: int = 0
+    evicted_rows: int = 0
+    evicted_bytes: int = 0
+    rows: int = 0
+    bytes: int = 0
+
+
+_NAMESPACE_LIMITS: Dict[str, NamespaceLimit] = {}
+_EVICTION_STATS: Dict[str, EvictionStats] = {}
+# {(path, namespace): {key: [last access in ms, reads]}} of size-limited
+# namespaces, written to the accessed and hits columns before each check
+_ACCESS_LOG: Dict[Tuple[str, str], Dict[str, List[int]]] = {}
+# {(path, namespace): writes since the last check}
+_WRITES_SINCE_CHECK: Dict[Tuple[str, str], int] = {}
+_LIMITS_LOCK = threading.Lock()
+
+
+def set_namespace_limit(
+    namespace: str,
+    max_rows: Optional[int] = None,
+    max_bytes: Optional[int] = None,
+    policy: str = "lru",
+) -> None:
+    """
+    Cap how many rows or bytes a namespace may take, evicting rows past it.
+
+    Meant for cache-like namespaces such as memoize results, which are
+    otherwise only bounded by their TTLs. Reads through get() and
+    get_many() are recorded in memory, so they stay reads; the recorded
+    access times and counts are written to the database right before a
+    size check. Checks run on the first write to the namespace and then
+    every KV_EVICT_CHECK_WRITES writes (writes inside transaction() are
+    checked on the first write after it ends), so a namespace can
+    briefly go over its limit. When it does, rows are evicted in one
+    transaction until it is back under KV_EVICT_LOW_WATERMARK of the
+    limit, expired rows first and then by policy. Flushed write-behind
+    changes count as writes, and are checked on the next synchronous
+    write. Rows written before limits existed count as never accessed.
+
+    Args:
+        namespace (str): The namespace, without the trailing ".".
+        max_rows (Optional[int]): Row limit, or None for no row limit.
+        max_bytes (Optional[int]): Limit on the total bytes of keys and
+            values, or None for no byte limit. Passing neither removes the
+            limit.
+        policy (str): "lru" or "lfu". Defaults to "lru".
+
+    Raises:
+        ValueError: If the policy is unknown or a limit is not positive.
+
+    Example:
+        >>> from src.ut_components.kv import KV, eviction_stats, set_namespace_limit
+        >>>
+        >>> set_namespace_limit("memoize", max_bytes=2 * 1024 * 1024)
+        >>> set_namespace_limit("thumbnails", max_rows=500, policy="lfu")
+        >>> with KV() as kv:
+        ...     for i in range(1000):
+        ...         kv.put(f"thumbnails.{i}", b"...")
+        >>> eviction_stats()["thumbnails"].evicted_rows
+        511
+    """
+    if policy not in ("lru", "lfu"):
+        raise ValueError(f"Unknown eviction policy {policy!r}, expected 'lru' or 'lfu'")
+    if (max_rows is not None and max_rows <= 0) or (max_bytes is not None and max_bytes <= 0):
+        raise ValueError("Namespace limits must be positive")
+    with _LIMITS_LOCK:
+        if max_rows is None and max_bytes is None:
+            _NAMESPACE_LIMITS.pop(namespace, None)
+            for log_key in [log_key for log_key in _ACCESS_LOG if log_key[1] == namespace]:
+                del _ACCESS_LOG[log_key]
+            return
+        _NAMESPACE_LIMITS[namespace] = NamespaceLimit(max_rows=max_rows, max_bytes=max_bytes, policy=policy)
+        _EVICTION_STATS.setdefault(namespace, EvictionStats())
+        for log_key in [log_key for log_key in _WRITES_SINCE_CHECK if log_key[1] == namespace]:
+            # check again on the next write
+            del _WRITES_SINCE_CHECK[log_key]
+
+
+def eviction_stats() -> Dict[str, EvictionStats]:
+    """
+    Return the eviction counters of every size-limited namespace.
+
+    Returns:
+        Dict[str, EvictionStats]: A snapshot of the counters by namespace.
+
+    Example:
+        >>> for namespace, stats in eviction_stats().items():
+        ...     print(namespace, stats.runs, stats.evicted_rows, stats.bytes)
+    """
+    with _LIMITS_LOCK:
+        return {namespace: replace(stats) for namespace, stats in _EVICTION_STATS.items()}
+
+
+def _record_access(path: str, key: str) -> None:
+    namespace = _namespace(key)
+    if namespace not in _NAMESPACE_LIMITS:
+        return
+    now_ms = int(time.time() * 1000)
+    with _LIMITS_LOCK:
+        log = _ACCESS_LOG.setdefault((path, namespace), {})
+        entry = log.get(key)
+        if entry is None:
+            log[key] = [now_ms, 1]
+        else:
+            entry[0] = now_ms
+            entry[1] += 1
+
+
+def _count_writes(path: str, keys: Iterable[str]) -> List[str]:
+    # Returns the size-limited namespaces due for a check.
+    due = []
+    with _LIMITS_LOCK:
+        for key in keys:
+            namespace = _namespace(key)
+            if namespace not in _NAMESPACE_LIMITS:
+                continue
+            # a namespace not checked yet in this process is due right away
+            count = _WRITES_SINCE_CHECK.get((path, namespace), KV_EVICT_CHECK_WRITES - 1) + 1
+            _WRITES_SINCE_CHECK[(path, namespace)] = count
+            if count >= KV_EVICT_CHECK_WRITES and namespace not in due:
+                due.append(namespace)
+    return due
+
+
+_WRITE_BEHIND_KEYS: Set[str] = set()
+_WRITE_BEHIND_PREFIXES: Tuple[str, ...] = ()
+# {path: {key: _Row or None for a delete}} not yet on disk
+_PENDING_WRITES: Dict[str, Dict[str, Optional[_Row]]] = {}
+_PENDING_LOCK = threading.Lock()
+_FLUSH_LOCK = threading.Lock()
+_FLUSH_WAKE = threading.Event()
+_FLUSH_THREAD: Optional[threading.Thread] = None
+
+
+def set_write_behind(keys: Iterable[str], interval_seconds: float = WRITE_BEHIND_INTERVAL) -> None:
+    """
+    Choose which keys are written behind instead of committed right away.
+
+    put() and delete() on a write-behind key only record the change in
+    memory and return; a background thread writes all recorded changes in
+    one transaction every interval_seconds, or sooner once
+    WRITE_BEHIND_MAX_PENDING changes are waiting. get(), get_many(),
+    get_partial() and iter_partial() see recorded changes immediately.
+    Pending changes are also written by flush_write_behind(), close_all()
+    and when the interpreter exits.
+
+    Use it for transient state such as progress flags, where losing the
+    last couple of seconds on a crash is fine and a commit per change is
+    not. Every other key keeps synchronous commits. Inside transaction(),
+    write-behind keys are written synchronously as part of the transaction.
+
+    Args:
+        keys (Iterable[str]): Exact keys, or namespaces ending with "."
+            that match every key starting with them. Replaces the previous
+            configuration; an empty iterable turns write-behind off.
+        interval_seconds (float): Seconds between background flushes.
+            Defaults to WRITE_BEHIND_INTERVAL.
+
+    Example:
+        >>> from src.ut_components.kv import KV, set_write_behind
+        >>>
+        >>> set_write_behind(["loading", "progress."])
+        >>> with KV() as kv:
+        ...     kv.put("loading", True)  # no commit, no fsync
+        ...     kv.get("loading")
+        True
+    """
+    global _WRITE_BEHIND_KEYS, _WRITE_BEHIND_PREFIXES, WRITE_BEHIND_INTERVAL
+    keys = list(keys)
+    _WRITE_BEHIND_KEYS = {key for key in keys if not key.endswith(".")}
+    _WRITE_BEHIND_PREFIXES = tuple(key for key in keys if key.endswith("."))
+    WRITE_BEHIND_INTERVAL = interval_seconds
+    _FLUSH_WAKE.set()
+
+
+def _is_write_behind(key: str) -> bool:
+    return key in _WRITE_BEHIND_KEYS or bool(_WRITE_BEHIND_PREFIXES and key.startswith(_WRITE_BEHIND_PREFIXES))
+
+
+def _defer(path: str, key: str, row: Optional[_Row]) -> None:
+    global _FLUSH_THREAD
+    with _PENDING_LOCK:
+        pending = _PENDING_WRITES.setdefault(path, {})
+        pending[key] = row
+        full = len(pending) >= WRITE_BEHIND_MAX_PENDING
+        if _FLUSH_THREAD is None:
+            _FLUSH_THREAD = threading.Thread(target=_flush_loop, name="kv-write-behind", daemon=True)
+            _FLUSH_THREAD.start()
+    READ_CACHE.invalidate(path, [key])
+    if full:
+        _FLUSH_WAKE.set()
+
+
+def _pending_row(path: str, key: str) -> Any:
+    # The pending (encoded, ttl) row, None for a pending delete, or _MISSING.
+    with _PENDING_LOCK:
+        return _PENDING_WRITES.get(path, {}).get(key, _MISSING)
+
+
+def _pending_range(path: str, prefix: str) -> List[Tuple[str, Optional[_Row]]]:
+    with _PENDING_LOCK:
+        pending = _PENDING_WRITES.get(path)
+        if not pending:
+            return []
+        return sorted((key, row) for key, row in pending.items() if key.startswith(prefix))
+
+
+def _discard_pending(path: str, keys: Iterable[str] = (), prefixes: Iterable[str] = ()) -> None:
+    # A synchronous write supersedes whatever was pending for the same keys.
+    prefixes = tuple(prefixes)
+    with _PENDING_LOCK:
+        pending = _PENDING_WRITES.get(path)
+        if not pending:
+            return
+        for key in keys:
+            pending.pop(key, None)
+        if prefixes:
+            for key in [key for key in pending if key.startswith(prefixes)]:
+                del pending[key]
+
+
+def flush_write_behind() -> int:
+    """
+    Write every pending write-behind change to disk now.
+
+    Changes are written in one transaction per database, with executemany()
+    in chunks of KV_BATCH_SIZE. Called periodically by the background
+    thread, by close_all() and at interpreter exit; call it directly before
+    handing the database file to something else.
+
+    Returns:
+        int: The number of keys written or deleted.
+
+    Example:
+        >>> from src.ut_components.kv import KV, flush_write_behind, set_write_behind
+        >>>
+        >>> set_write_behind(["loading"])
+        >>> with KV() as kv:
+        ...     kv.put("loading", False)
+        >>> flush_write_behind()
+        1
+    """
+    flushed = 0
+    with _PENDING_LOCK:
+        paths = [path for path, pending in _PENDING_WRITES.items() if pending]
+    for path in paths:
+        connection = _acquire_connection(path)
+        conn = connection.conn
+        depth = connection.transaction_depth
+        try:
+            if not depth:
+                # Lock order is SQLite write lock, then _FLUSH_LOCK: writers
+                # inside transaction() hold the write lock when they take
+                # _FLUSH_LOCK in KV._supersede, so never wait for the write
+                # lock while holding _FLUSH_LOCK.
+                conn.commit()
+                conn.execute("BEGIN IMMEDIATE")
+            with _FLUSH_LOCK:
+                with _PENDING_LOCK:
+                    pending = dict(_PENDING_WRITES.get(path, {}))
+                rows = [(key, *row) for key, row in pending.items() if row is not None]
+                deletes = [(key,) for key, row in pending.items() if row is None]
+                for chunk in _chunks(rows):
+                    conn.executemany(_INSERT_ROW, chunk)
+                for chunk in _chunks(deletes):
+                    conn.executemany("DELETE FROM kv WHERE key = ?", chunk)
+                if not depth:
+                    conn.commit()
+                else:
+                    connection.touched_keys.update(pending)
+                READ_CACHE.invalidate(path, pending)
+                if _NAMESPACE_LIMITS:
+                    _count_writes(path, pending)
+                with _PENDING_LOCK:
+                    current = _PENDING_WRITES.get(path, {})
+                    for key, row in pending.items():
+                        # keep keys written again while flushing
+                        if key in current and current[key] is row:
+                            del current[key]
+        except BaseException:
+            if not depth:
+                conn.rollback()
+            raise
+        finally:
+            _release_connection(path)
+        flushed += len(pending)
+    return flushed
+
+
+def _flush_loop() -> None:
+    while True:
+        _FLUSH_WAKE.wait(WRITE_BEHIND_INTERVAL)
+        _FLUSH_WAKE.clear()
+        try:
+            flush_write_behind()
+        except sqlite3.Error:
+            # the changes stay pending and are retried on the next tick
+            pass
+
+
+atexit.register(flush_write_behind)
+
+
+def _ensure_schema(conn: sqlite3.Connection, path: str) -> None:
+    with _POOL_LOCK:
+        if path in _SCHEMA_READY:
+            return
+        conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS kv (
+                key TEXT PRIMARY KEY,
+                value TEXT default '',
+                ttl integer DEFAULT NULL,
+                codec integer DEFAULT NULL,
+                namespace TEXT NOT NULL DEFAULT '',
+                accessed integer DEFAULT NULL,
+                hits integer NOT NULL DEFAULT 0
+            )
+        """
+        )
+        columns = {row[1] for row in conn.execute("PRAGMA table_info(kv)")}
+        if "codec" not in columns:
+            # rows written before codecs keep NULL and the {"value": ...} wrapper
+            conn.execute("ALTER TABLE kv ADD COLUMN codec integer DEFAULT NULL")
+        if "namespace" not in columns:
+            conn.execute("ALTER TABLE kv ADD COLUMN namespace TEXT NOT NULL DEFAULT ''")
+            conn.execute(f"UPDATE kv SET namespace = {_NAMESPACE_SQL.format(key='key')}")
+        if "accessed" not in columns:
+            conn.execute("ALTER TABLE kv ADD COLUMN accessed integer DEFAULT NULL")
+            conn.execute("ALTER TABLE kv ADD COLUMN hits integer NOT NULL DEFAULT 0")
+        conn.execute("CREATE INDEX IF NOT EXISTS kv_ttl ON kv (ttl) WHERE ttl IS NOT NULL")
+        conn.execute("CREATE INDEX IF NOT EXISTS kv_namespace ON kv (namespace, key)")
+        conn.commit()
+        _SCHEMA_READY.add(path)
+
+
+def set_pragma_profile(profile: Union[str, Dict[str, Union[str, int]]]) -> None:
+    """
+    Choose the SQLite pragmas used by KV connections.
+
+    Takes the name of one of PRAGMA_PROFILES ("default", "durable",
+    "low_memory" or "legacy") or a dict of pragma names to values. The pragmas
+    are applied to every connection opened afterwards; pooled connections that
+    were opened with the previous profile are closed when released instead of
+    being reused.
+
+    Args:
+        profile (Union[str, Dict[str, Union[str, int]]]): A profile name, or
+            a dict such as {"journal_mode": "WAL", "synchronous": "FULL"}.
+
+    Raises:
+        KeyError: If the profile name is unknown.
+
+    Example:
+        >>> from src.ut_components.kv import KV, set_pragma_profile
+        >>>
+        >>> # fsync on every commit, for data that must survive a power loss
+        >>> set_pragma_profile("durable")
+        >>>
+        >>> # or tune individual pragmas
+        >>> set_pragma_profile({"journal_mode": "WAL", "cache_size": -1024})
+    """
+    global PRAGMAS, _PRAGMAS_VERSION
+    pragmas = PRAGMA_PROFILES[profile] if isinstance(profile, str) else dict(profile)
+    with _POOL_LOCK:
+        PRAGMAS = pragmas
+        _PRAGMAS_VERSION += 1
+        connections = [connection for idle in _IDLE_CONNECTIONS.values() for connection in idle]
+        _IDLE_CONNECTIONS.clear()
+    for connection in connections:
+        connection.conn.close()
+
+
+def _connect(path: str) -> _Connection:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with _POOL_LOCK:
+        pragmas, pragmas_version = PRAGMAS, _PRAGMAS_VERSION
+    # Only ever used by one thread at a time: the one holding it in _THREAD_STATE.
+    conn = sqlite3.connect(path, check_same_thread=False)
+    if not conn.execute("PRAGMA page_count").fetchone()[0]:
+        # Only takes effect before the first page is written, and switching to
+        # WAL below writes it; reap_expired() converts older databases.
+        conn.execute(f"PRAGMA auto_vacuum = {AUTO_VACUUM_INCREMENTAL}")
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}").fetchall()
+    return _Connection(conn, pragmas_version)
+
+
+def _acquire_connection(path: str) -> _Connection:
+    held = getattr(_THREAD_STATE, "connections", None)
+    if held is None:
+        held = _THREAD_STATE.connections = {}
+    connection = held.get(path)
+    if connection is None:
+        with _POOL_LOCK:
+            idle = _IDLE_CONNECTIONS.get(path)
+            connection = idle.pop() if idle else None
+        if connection is None:
+            connection = _connect(path)
+        _ensure_schema(connection.conn, path)
+        held[path] = connection
+    connection.handles += 1
+    return connection
+
+
+def _release_connection(path: str) -> None:
+    held = _THREAD_STATE.connections
+    connection = held[path]
+    connection.handles -= 1
+    if connection.handles > 0:
+        return
+
+    del held[path]
+    connection.conn.commit()
+    with _POOL_LOCK:
+        idle = _IDLE_CONNECTIONS.setdefault(path, [])
+        if len(idle) < KV_POOL_SIZE and connection.pragmas_version == _PRAGMAS_VERSION:
+            idle.append(connection)
+            return
+    connection.conn.close()
+
+
+def _chunks(items: Iterable[Any], size: int = KV_BATCH_SIZE) -> Iterator[List[Any]]:
+    iterator = iter(items)
+    while True:
+        chunk = list(itertools.islice(iterator, size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def _prefix_range(prefix: str) -> Tuple[str, Optional[str]]:
+    # Keys starting with prefix are exactly those in [prefix, upper), where
+    # upper is prefix with its last character incremented. TEXT keys compare
+    # as UTF-8 bytes, which orders like code points, so this is served by the
+    # primary key index and no character in prefix acts as a wildcard.
+    chars = prefix
+    while chars:
+        last = ord(chars[-1])
+        if last < 0x10FFFF:
+            # surrogates can not be encoded as UTF-8
+            upper = 0xE000 if 0xD800 <= last + 1 <= 0xDFFF else last + 1
+            return prefix, chars[:-1] + chr(upper)
+        chars = chars[:-1]
+    return prefix, None
+
+
+def close_all() -> None:
+    """
+    Close every idle pooled connection.
+
+    KV handles return their connection to a small pool when closed instead of
+    closing it, so later handles skip connecting and creating the schema. Call
+    this on shutdown, or in tests that remove the database file, to release
+    those connections. Handles that are still open are not affected.
+
+    Example:
+        >>> from src.ut_components.kv import KV, close_all
+        >>>
+        >>> with KV() as kv:
+        ...     kv.put("key", "value")
+        >>> close_all()  # the connection used above is closed now
+    """
+    flush_write_behind()
+    with _POOL_LOCK:
+        connections = [connection for idle in _IDLE_CONNECTIONS.values() for connection in idle]
+        _IDLE_CONNECTIONS.clear()
+        _SCHEMA_READY.clear()
+    for connection in connections:
+        connection.conn.close()
+
+
+@dataclass
+class ReapResult:
+    """
+    Outcome of a KV.reap_expired() run.
+
+    Attributes:
+        deleted (int): Expired rows deleted.
+        size_before (int): Database file size in bytes before the run.
+        size_after (int): Database file size in bytes after the run.
+        reclaimed (int): Bytes returned to the filesystem.
+        vacuumed (bool): Whether the database was rebuilt to enable
+            incremental vacuum (done once for databases created before it).
+    """
+
+    deleted: int
+    size_before: int
+    size_after: int
+    reclaimed: int
+    vacuumed: bool = False
+
+
+@dataclass
+class NamespaceSize:
+    """
+    Space used by one namespace of the kv table.
+
+    Attributes:
+        rows (int): Rows in the namespace, expired ones not yet reaped included.
+        bytes (int): Total size of their keys and values.
+    """
+
+    rows: int
+    bytes: int
+
 
 class KV:
     """
@@ -30,15 +886,28 @@ class KV:
     The KV class provides a simple yet powerful interface for storing and retrieving
     data persistently using SQLite as the backend. It supports automatic expiration
     of entries through TTL, batch operations for performance, and prefix-based queries.
-    All values are automatically serialized to JSON for storage.
+    Strings are stored as plain text, bytes as-is in a SQLite BLOB and everything
+    else as JSON, unless another codec is chosen per call or per namespace; the
+    codec is stored with each value so it always reads back as written.
 
     Features:
         - Persistent storage using SQLite
-        - TTL support for automatic expiration
-        - Batch operations for improved performance
+        - TTL support for automatic expiration, with reap_expired() to purge
+          expired rows and reclaim their space
+        - Batch operations (put_many, get_many, delete_many, transaction)
         - Prefix-based queries and deletions
+        - Namespaces (the key part before the first ".") that can be cleared
+          and measured through their own index (see clear_namespace)
         - Context manager support for automatic cleanup
+        - Pooled per-thread connections, schema created once per process
+        - WAL journal so readers never wait for the writer (see set_pragma_profile)
         - JSON serialization for complex data types
+        - Raw text and BLOB storage for str and bytes values
+        - Compact binary codec for dicts and lists (see set_namespace_codec)
+        - Optional in-memory read cache for hot keys (see set_read_cache_size)
+        - Optional write-behind for transient keys (see set_write_behind)
+        - Optional per-namespace size limits with LRU or LFU eviction
+          (see set_namespace_limit)
 
     Example:
         >>> from src.ut_components.kv import KV
@@ -70,6 +939,12 @@ class KV:
         (as determined by get_config_path()) and sets up the necessary
         table structure for key-value storage with TTL support.
 
+        Opening a KV is cheap: the connection comes from a small pool and the
+        table is only created the first time this process opens the database.
+        Handles opened on the same thread while another one is still open
+        share its connection, so nested `with KV()` blocks see each other's
+        writes.
+
         The database file is created at: {config_path}/kv.db
 
         Example:
@@ -82,45 +957,354 @@ class KV:
             >>> kv.put("my_key", "my_value")
             >>> kv.close()
         """
-        config_folder = get_config_path()
-        os.makedirs(config_folder, exist_ok=True)
-        self.conn = sqlite3.connect(os.path.join(config_folder, "kv.db"))
+        self.path = os.path.join(get_config_path(), "kv.db")
+        self.connection = _acquire_connection(self.path)
+        self.conn = self.connection.conn
         self.cursor = self.conn.cursor()
-        self.cursor.execute(
-            """
-            CREATE TABLE IF NOT EXISTS kv (
-                key TEXT PRIMARY KEY,
-                value TEXT default '',
-                ttl integer DEFAULT NULL
-            )
-        """
-        )
-        self.conn.commit()
+        self.closed = False
         self.cache_values = []
         self.cache_row_count = 0
 
-    def _encode_value(self, value: Any) -> str:
-        return json.dumps({"value": value})
+    def _commit(self) -> None:
+        # Inside transaction() the outermost block commits.
+        if not self.connection.transaction_depth:
+            self.conn.commit()
+
+    def _expiry(self, ttl_seconds: Optional[int]) -> Optional[int]:
+        if ttl_seconds:
+            return int((datetime.now() + timedelta(seconds=ttl_seconds)).timestamp())
+        return None
+
+    @contextmanager
+    def transaction(self) -> Iterator["KV"]:
+        """
+        Group any number of KV operations into a single transaction.
+
+        Everything done on this thread's KV handles inside the block is
+        committed at once when the block exits, with a single fsync, or rolled
+        back if it raises. Blocks can be nested; an inner block that raises
+        only rolls back its own changes (it is a SQLite savepoint). The write
+        lock is taken when the outermost block starts, so keep blocks short.
+
+        Yields:
+            KV: This handle, for convenience.
+
+        Example:
+            >>> with KV() as kv:
+            ...     with kv.transaction():
+            ...         kv.delete_partial("cache:user:")
+            ...         kv.put("cache:version", 2)
+            ...         kv.put_many({"cache:user:1": "Alice", "cache:user:2": "Bob"})
+        """
+        connection = self.connection
+        depth = connection.transaction_depth
+        if depth == 0:
+            self.conn.commit()
+            self.conn.execute("BEGIN IMMEDIATE")
+        else:
+            self.conn.execute(f"SAVEPOINT kv_{depth}")
+        connection.transaction_depth += 1
+        try:
+            yield self
+        except BaseException:
+            connection.transaction_depth -= 1
+            if depth == 0:
+                self.conn.rollback()
+                self._end_transaction()
+            else:
+                self.conn.execute(f"ROLLBACK TO kv_{depth}")
+                self.conn.execute(f"RELEASE kv_{depth}")
+            raise
+        connection.transaction_depth -= 1
+        if depth == 0:
+            self.conn.commit()
+            self._end_transaction()
+        else:
+            self.conn.execute(f"RELEASE kv_{depth}")
+
+    def _end_transaction(self) -> None:
+        connection = self.connection
+        if connection.touched_keys or connection.touched_prefixes:
+            READ_CACHE.invalidate(self.path, connection.touched_keys, connection.touched_prefixes)
+            connection.touched_keys = set()
+            connection.touched_prefixes = set()
+
+    def _supersede(self, keys: Iterable[str] = (), prefixes: Iterable[str] = ()) -> None:
+        # A synchronous write replaces whatever write-behind change is pending
+        # for the same keys. Drop it before writing, under _FLUSH_LOCK, so a
+        # flush that already picked it up can't land after this write.
+        if _PENDING_WRITES:
+            with _FLUSH_LOCK:
+                _discard_pending(self.path, keys, prefixes)
+
+    def _written(self, keys: Iterable[str] = (), prefixes: Iterable[str] = ()) -> None:
+        # Called after every write. Outside a transaction the write is already
+        # committed; inside one the keys are dropped now, so no reader keeps the
+        # old value, and again when it ends, so no reader keeps a value it read
+        # before the commit.
+        if not READ_CACHE.max_bytes:
+            return
+        keys, prefixes = list(keys), list(prefixes)
+        READ_CACHE.invalidate(self.path, keys, prefixes)
+        if self.connection.transaction_depth:
+            self.connection.touched_keys.update(keys)
+            self.connection.touched_prefixes.update(prefixes)
+
+    def database_size(self) -> int:
+        """
+        Return the size of the database file in bytes.
+
+        Counts every page of the main database file, free pages included.
+        Pages waiting in the WAL are not counted.
+
+        Returns:
+            int: page_count * page_size.
+
+        Example:
+            >>> with KV() as kv:
+            ...     print(kv.database_size())  # e.g. 98304
+        """
+        page_count = self.conn.execute("PRAGMA page_count").fetchone()[0]
+        page_size = self.conn.execute("PRAGMA page_size").fetchone()[0]
+        return page_count * page_size
+
+    def namespace_sizes(self) -> Dict[str, NamespaceSize]:
+        """
+        Return how many rows and bytes each namespace takes.
+
+        The namespace of a key is the part before its first ".", so
+        "bw.items" and "bw.folders" both count towards "bw", and a key with
+        no "." is its own namespace. Write-behind changes not flushed yet
+        are not counted.
+
+        Returns:
+            Dict[str, NamespaceSize]: Sizes by namespace.
+
+        Example:
+            >>> with KV() as kv:
+            ...     for namespace, size in kv.namespace_sizes().items():
+            ...         print(namespace, size.rows, size.bytes)
+            bw 412 1873920
+            config 1 33
+        """
+        rows = self.conn.execute(f"SELECT namespace, COUNT(*), SUM({_ROW_BYTES_SQL}) FROM kv GROUP BY namespace")
+        return {namespace: NamespaceSize(rows=count, bytes=size or 0) for namespace, count, size in rows}
+
+    def clear_namespace(self, namespace: str) -> None:
+        """
+        Delete every key of a namespace.
+
+        Deletes the keys equal to namespace or starting with namespace + "."
+        through the (namespace, key) index. Unlike delete_partial(namespace),
+        keys that merely share the prefix, such as "bwx" for "bw", are kept.
+
+        Args:
+            namespace (str): The namespace, without the trailing ".".
+
+        Example:
+            >>> with KV() as kv:
+            ...     kv.put("session.token", "abc")
+            ...     kv.put("session.user", {"id": 1})
+            ...     kv.clear_namespace("session")
+            ...     kv.get("session.token")
+            None
+        """
+        self._supersede([namespace], [namespace + "."])
+        self.cursor.execute("DELETE FROM kv WHERE namespace = ?", (namespace,))
+        self._commit()
+        self._written([namespace], [namespace + "."])
+
+    def _note_writes(self, keys: Iterable[str]) -> None:
+        due = _count_writes(self.path, keys)
+        # inside a transaction the namespace stays due until the next write
+        if due and not self.connection.transaction_depth:
+            for namespace in due:
+                self._evict(namespace)
+
+    def enforce_limits(self, namespace: Optional[str] = None) -> int:
+        """
+        Check size-limited namespaces now and evict rows that are over limit.
+
+        Writes already do this every KV_EVICT_CHECK_WRITES writes (see
+        set_namespace_limit()); call it to bring a namespace back under its
+        limit right away, e.g. after lowering the limit.
+
+        Args:
+            namespace (Optional[str]): The namespace to check. Defaults to
+                every namespace with a limit.
+
+        Returns:
+            int: The number of rows evicted.
+
+        Example:
+            >>> set_namespace_limit("memoize", max_rows=100)
+            >>> with KV() as kv:
+            ...     kv.enforce_limits("memoize")
+            412
+        """
+        namespaces = [namespace] if namespace is not None else list(_NAMESPACE_LIMITS)
+        return sum(self._evict(name) for name in namespaces)
+
+    def _evict(self, namespace: str) -> int:
+        limit = _NAMESPACE_LIMITS.get(namespace)
+        if limit is None:
+            return 0
+        with _LIMITS_LOCK:
+            accesses = _ACCESS_LOG.pop((self.path, namespace), {})
+            _WRITES_SINCE_CHECK[(self.path, namespace)] = 0
+        now_seconds = int(datetime.now().timestamp())
+        victims: List[str] = []
+        freed = 0
+        with self.transaction():
+            if accesses:
+                self.cursor.executemany(
+                    "UPDATE kv SET accessed = MAX(COALESCE(accessed, 0), ?), hits = hits + ? WHERE key = ?",
+                    ((accessed, hits, key) for key, (accessed, hits) in accesses.items()),
+                )
+            rows, size = self.conn.execute(
+                f"SELECT COUNT(*), COALESCE(SUM({_ROW_BYTES_SQL}), 0) FROM kv WHERE namespace = ?",
+                (namespace,),
+            ).fetchone()
+            excess_rows = excess_bytes = 0
+            if limit.max_rows is not None and rows > limit.max_rows:
+                excess_rows = rows - int(limit.max_rows * KV_EVICT_LOW_WATERMARK)
+            if limit.max_bytes is not None and size > limit.max_bytes:
+                excess_bytes = size - int(limit.max_bytes * KV_EVICT_LOW_WATERMARK)
+            if excess_rows or excess_bytes:
+                order = "accessed" if limit.policy == "lru" else "hits, accessed"
+                candidates = self.conn.execute(
+                    f"""
+                    SELECT key, {_ROW_BYTES_SQL} FROM kv WHERE namespace = ?
+                    ORDER BY (ttl IS NOT NULL AND ttl <= ?) DESC, {order}, key
+                """,
+                    (namespace, now_seconds),
+                )
+                for key, row_bytes in candidates:
+                    if len(victims) >= excess_rows and freed >= excess_bytes:
+                        break
+                    victims.append(key)
+                    freed += row_bytes
+                candidates.close()
+                for chunk in _chunks(victims):
+                    self._supersede(chunk)
+                    self.cursor.executemany("DELETE FROM kv WHERE key = ?", ((key,) for key in chunk))
+                    self._written(chunk)
+        with _LIMITS_LOCK:
+            stats = _EVICTION_STATS.setdefault(namespace, EvictionStats())
+            stats.checks += 1
+            if victims:
+                stats.runs += 1
+                stats.evicted_rows += len(victims)
+                stats.evicted_bytes += freed
+            stats.rows = rows - len(victims)
+            stats.bytes = size - freed
+        return len(victims)
+
+    def reap_expired(
+        self,
+        batch_size: int = KV_REAP_BATCH_SIZE,
+        max_batches: int = KV_REAP_MAX_BATCHES,
+        vacuum_pages: int = KV_VACUUM_PAGES,
+    ) -> ReapResult:
+        """
+        Delete expired rows in small batches and give the space back.
+
+        Expired rows are hidden from reads but stay on disk until reaped.
+        Each batch of at most batch_size rows is deleted in its own short
+        transaction, found through the index on ttl, so other threads are
+        never blocked for long. Afterwards up to vacuum_pages free pages are
+        released with incremental_vacuum. Databases created before incremental
+        vacuum was enabled are rebuilt once with VACUUM to switch it on.
+
+        Designed to run periodically from a low-priority background job;
+        anything left over is picked up by the next run.
+
+        Args:
+            batch_size (int): Rows deleted per transaction.
+            max_batches (int): Maximum number of batches in this run.
+            vacuum_pages (int): Maximum number of free pages to release.
 
-    def _decode_value(self, value: str) -> Any:
+        Returns:
+            ReapResult: Rows deleted and database size before and after.
+
+        Example:
+            >>> with KV() as kv:
+            ...     result = kv.reap_expired()
+            ...     print(result.deleted, result.reclaimed)
+        """
+        size_before = self.database_size()
+        now_seconds = int(datetime.now().timestamp())
+        deleted = 0
+        for _ in range(max_batches):
+            with self.transaction():
+                self.cursor.execute(
+                    """
+                    DELETE FROM kv WHERE key IN (
+                        SELECT key FROM kv WHERE ttl IS NOT NULL AND ttl <= ? LIMIT ?
+                    )
+                """,
+                    (now_seconds, batch_size),
+                )
+                count = self.cursor.rowcount
+            deleted += count
+            if count < batch_size:
+                break
+
+        vacuumed = False
+        if self.conn.execute("PRAGMA auto_vacuum").fetchone()[0] != AUTO_VACUUM_INCREMENTAL:
+            self._commit()
+            self.conn.execute(f"PRAGMA auto_vacuum = {AUTO_VACUUM_INCREMENTAL}")
+            self.conn.execute("VACUUM")
+            vacuumed = True
+        else:
+            self.conn.execute(f"PRAGMA incremental_vacuum({int(vacuum_pages)})").fetchall()
+
+        size_after = self.database_size()
+        return ReapResult(
+            deleted=deleted,
+            size_before=size_before,
+            size_after=size_after,
+            reclaimed=max(0, size_before - size_after),
+            vacuumed=vacuumed,
+        )
+
+    def _encode_value(self, key: str, value: Any, codec: Optional[str] = None) -> Tuple[Union[str, bytes], int]:
+        if codec is None and _NAMESPACE_CODECS:
+            codec = _NAMESPACE_CODECS.get(_namespace(key))
+        chosen = CODECS[codec] if codec is not None else pick_codec(value)
+        return chosen.encode(value), chosen.tag
+
+    def _decode_value(self, value: Union[str, bytes], tag: Optional[int]) -> Any:
+        if tag is not None:
+            return CODECS_BY_TAG[tag].decode(value)
+        # written before codecs existed
+        if isinstance(value, bytes):
+            return value
         return json.loads(value).get("value", None)
 
-    def put(self, key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
+    def put(self, key: str, value: Any, ttl_seconds: Optional[int] = None, codec: Optional[str] = None) -> None:
         """
         Store a key-value pair in the database with optional TTL.
 
-        Inserts or updates a key-value pair in the storage. The value is
-        automatically serialized to JSON before storage, allowing you to
-        store complex Python objects (dicts, lists, etc.).
+        Inserts or updates a key-value pair in the storage. By default
+        strings are stored as plain text, bytes as a BLOB and everything else
+        as JSON, allowing you to store complex Python objects (dicts, lists,
+        etc.). The codec used is stored with the value, so get() decodes it
+        the same way whatever codec it was written with.
 
         Args:
             key (str): The unique identifier for the value. If the key already
                 exists, its value will be replaced.
             value (Any): The value to store. Can be any JSON-serializable Python
-                object (str, int, float, bool, dict, list, None).
+                object (str, int, float, bool, dict, list, None), or bytes, which
+                are stored unencoded as a BLOB.
             ttl_seconds (Optional[int]): Time-to-live in seconds. If provided,
                 the entry will automatically expire after this duration.
                 Defaults to None (no expiration).
+            codec (Optional[str]): One of "json", "text", "blob" or "binary"
+                (see src.ut_components.codec). Defaults to the codec set for
+                the key's namespace with set_namespace_codec(), if any, or to
+                text, blob or json depending on the value's type.
 
         Example:
             >>> kv = KV()
@@ -138,20 +1322,30 @@ class KV:
             >>> # Store with expiration (1 hour)
             >>> kv.put("session:token", "abc123xyz", ttl_seconds=3600)
             >>>
+            >>> # Store raw bytes, read back as bytes
+            >>> kv.put("blob:avatar", b"raw image bytes")
+            >>>
+            >>> # Store a dict in the compact binary format
+            >>> kv.put("user:prefs", {"font": 12, "dark": True}, codec="binary")
+            >>>
             >>> kv.close()
         """
-        if ttl_seconds:
-            ttl = int((datetime.now() + timedelta(seconds=ttl_seconds)).timestamp())
+        ttl = self._expiry(ttl_seconds)
+        encoded, tag = self._encode_value(key, value, codec)
+        if (_WRITE_BEHIND_KEYS or _WRITE_BEHIND_PREFIXES) and not self.connection.transaction_depth:
+            if _is_write_behind(key):
+                _defer(self.path, key, (encoded, tag, ttl))
+                return
+        self._supersede([key])
+        generation = READ_CACHE.generation
+        self.cursor.execute(_INSERT_ROW, (key, encoded, tag, ttl))
+        self._commit()
+        if READ_CACHE.max_bytes and not self.connection.transaction_depth:
+            READ_CACHE.store(self.path, key, encoded, tag, ttl, generation, write=True)
         else:
-            ttl = None
-
-        self.cursor.execute(
-            """
-            INSERT OR REPLACE INTO kv (key, value, ttl) VALUES (?, ?, ?)
-        """,
-            (key, self._encode_value(value), ttl),
-        )
-        self.conn.commit()
+            self._written([key])
+        if _NAMESPACE_LIMITS:
+            self._note_writes([key])
 
     def get(
         self,
@@ -176,7 +1370,8 @@ class KV:
 
         Returns:
             Optional[Any]: The stored value if found and not expired, otherwise
-            the default value. The value is automatically deserialized from JSON.
+            the default value. The value is automatically deserialized from JSON,
+            or returned as bytes if it was stored as bytes.
 
         Example:
             >>> kv = KV()
@@ -204,34 +1399,63 @@ class KV:
             >>> kv.close()
         """
         now_seconds = int(datetime.now().timestamp())
+        if _NAMESPACE_LIMITS:
+            _record_access(self.path, key)
+
+        if _PENDING_WRITES:
+            row = _pending_row(self.path, key)
+            if row is not _MISSING:
+                if row is None or (row[2] is not None and row[2] <= now_seconds):
+                    if save_default_if_not_set:
+                        self.put(key, default)
+                    return default
+                return self._decode_value(row[0], row[1])
+
+        if READ_CACHE.max_bytes:
+            entry = READ_CACHE.lookup(self.path, key, now_seconds)
+            if entry is not None:
+                result, tag, value = entry[0], entry[1], entry[2]
+                if value is not _MISSING:
+                    return value
+                if _stored(result, tag):
+                    value = self._decode_value(result, tag)
+                    if isinstance(value, _IMMUTABLE_TYPES):
+                        entry[2] = value
+                    return value
+                if save_default_if_not_set:
+                    self.put(key, default)
+                return default
+            generation = READ_CACHE.generation
 
         self.cursor.execute(
             """
-            SELECT value FROM kv WHERE key = ? AND (ttl IS NULL OR ttl > ?)
+            SELECT value, codec, ttl FROM kv WHERE key = ? AND (ttl IS NULL OR ttl > ?)
         """,
             (key, now_seconds),
         )
-        result = self.cursor.fetchone()
-        if result:
-            result = result[0]
-        else:
-            result = None
+        row = self.cursor.fetchone()
+        result, tag, ttl = row if row else (None, None, None)
+        if READ_CACHE.max_bytes and row and not self.connection.transaction_depth:
+            READ_CACHE.store(self.path, key, result, tag, ttl, generation)
 
-        if not result:
+        if not _stored(result, tag):
             if save_default_if_not_set:
                 self.put(key, default)
             return default
 
-        return self._decode_value(result)
+        return self._decode_value(result, tag)
 
     def get_partial(self, beginning: str) -> List[Tuple[str, Any]]:
         """
         Retrieve all key-value pairs where keys start with a given prefix.
 
         Performs a prefix search on keys and returns all matching entries
-        that haven't expired. Results are sorted by value (in JSON string form).
-        This is useful for implementing features like autocomplete, finding
-        all items in a category, or retrieving related configuration options.
+        that haven't expired, sorted by key. The search is a range scan over
+        the primary key index, and characters such as `%` and `_` in the prefix
+        match only themselves. This is useful for implementing features like
+        autocomplete, finding all items in a category, or retrieving related
+        configuration options. Use iter_partial() to avoid loading every
+        match into memory at once.
 
         Args:
             beginning (str): The prefix to search for. All keys starting with
@@ -266,16 +1490,66 @@ class KV:
             >>>
             >>> kv.close()
         """
+        return list(self.iter_partial(beginning))
+
+    def iter_partial(self, beginning: str) -> Iterator[Tuple[str, Any]]:
+        """
+        Lazily iterate over the key-value pairs whose keys start with a prefix.
+
+        Same matches and order as get_partial(), but rows are fetched from
+        SQLite and decoded one at a time as the iterator is consumed, so large
+        namespaces can be walked without holding them all in memory. The
+        iterator uses its own cursor; writes to other keys while iterating are
+        fine, but rows inserted into the scanned range may or may not be seen.
+
+        Args:
+            beginning (str): The prefix to search for.
+
+        Yields:
+            Tuple[str, Any]: (key, value) pairs in key order.
+
+        Example:
+            >>> kv = KV()
+            >>>
+            >>> for key, value in kv.iter_partial("user:"):
+            ...     if value.get("inactive"):
+            ...         kv.delete(key)
+            >>>
+            >>> kv.close()
+        """
         now_seconds = int(datetime.now().timestamp())
+        lower, upper = _prefix_range(beginning)
+        if upper is None:
+            rows = self.conn.execute(
+                "SELECT key, value, codec FROM kv WHERE key >= ? AND (ttl IS NULL OR ttl > ?)",
+                (lower, now_seconds),
+            )
+        else:
+            rows = self.conn.execute(
+                "SELECT key, value, codec FROM kv WHERE key >= ? AND key < ? AND (ttl IS NULL OR ttl > ?)",
+                (lower, upper, now_seconds),
+            )
+        pending = _pending_range(self.path, beginning) if _PENDING_WRITES else []
+        if not pending:
+            for key, value, tag in rows:
+                yield key, self._decode_value(value, tag)
+            return
 
-        self.cursor.execute(
-            """
-            SELECT key, value FROM kv WHERE key LIKE ? || '%' AND (ttl IS NULL OR ttl > ?) ORDER BY value
-        """,
-            (beginning, now_seconds),
-        )
-        result = self.cursor.fetchall()
-        return [(x[0], self._decode_value(x[1])) for x in result]
+        # merge write-behind changes not on disk yet into the ordered scan
+        index = 0
+        for key, value, tag in rows:
+            while index < len(pending) and pending[index][0] <= key:
+                pending_key, row = pending[index]
+                index += 1
+                if row is not None and (row[2] is None or row[2] > now_seconds):
+                    yield pending_key, self._decode_value(row[0], row[1])
+                if pending_key == key:
+                    break
+            else:
+                yield key, self._decode_value(value, tag)
+        for pending_key, row in pending[index:]:
+            if row is not None and (row[2] is None or row[2] > now_seconds):
+                yield pending_key, self._decode_value(row[0], row[1])
 
     def delete(self, key: str) -> None:
         """
@@ -301,21 +1575,28 @@ class KV:
             >>>
             >>> kv.close()
         """
+        if (_WRITE_BEHIND_KEYS or _WRITE_BEHIND_PREFIXES) and not self.connection.transaction_depth:
+            if _is_write_behind(key):
+                _defer(self.path, key, None)
+                return
+        self._supersede([key])
         self.cursor.execute(
             """
             DELETE FROM kv WHERE key = ?
         """,
             (key,),
         )
-        self.conn.commit()
+        self._commit()
+        self._written([key])
 
     def delete_partial(self, beginning: str):
         """
         Delete all key-value pairs where keys start with a given prefix.
 
         Performs a bulk deletion of all entries whose keys match the specified
-        prefix. This is useful for cleaning up related data, removing all items
-        in a category, or clearing cache entries with a common prefix.
+        prefix, as a range delete over the primary key index. This is useful
+        for cleaning up related data, removing all items in a category, or
+        clearing cache entries with a common prefix.
 
         Args:
             beginning (str): The prefix to match. All keys starting with
@@ -344,21 +1625,23 @@ class KV:
             >>>
             >>> kv.close()
         """
-        self.cursor.execute(
-            """
-            DELETE FROM kv WHERE key like ? || '%'
-        """,
-            (beginning,),
-        )
-        self.conn.commit()
+        self._supersede(prefixes=[beginning])
+        lower, upper = _prefix_range(beginning)
+        if upper is None:
+            self.cursor.execute("DELETE FROM kv WHERE key >= ?", (lower,))
+        else:
+            self.cursor.execute("DELETE FROM kv WHERE key >= ? AND key < ?", (lower, upper))
+        self._commit()
+        self._written(prefixes=[beginning])
 
     def close(self) -> None:
         """
-        Close the database connection and commit any pending changes.
+        Commit any pending changes and release the database connection.
 
-        Ensures all pending transactions are committed and properly closes
-        the SQLite database connection. This should be called when you're
-        done using the KV instance to free up resources.
+        Ensures all pending transactions are committed and hands the
+        connection back to the pool for the next KV handle. This should be
+        called when you're done using the KV instance. Calling it twice is
+        safe.
 
         Note: If using the KV class as a context manager (with statement),
         this method is called automatically.
@@ -373,8 +1656,12 @@ class KV:
             ...     kv.put("data", "value")
             >>> # close() is called automatically here
         """
-        self.conn.commit()
-        self.conn.close()
+        if self.closed:
+            return
+        self.closed = True
+        self._commit()
+        self.cursor.close()
+        _release_connection(self.path)
 
     def __enter__(self):
         return self
@@ -382,7 +1669,7 @@ class KV:
     def __exit__(self, exc_type, exc_value, traceback):
         self.close()
 
-    def put_cached(self, key: str, value: Any, ttl_seconds: Optional[int] = None) -> None:
+    def put_cached(self, key: str, value: Any, ttl_seconds: Optional[int] = None, codec: Optional[str] = None) -> None:
         """
         Add a key-value pair to the cache for batch insertion.
 
@@ -398,6 +1685,7 @@ class KV:
             ttl_seconds (Optional[int]): Time-to-live in seconds. If provided,
                 the entry will automatically expire after this duration.
                 Defaults to None (no expiration).
+            codec (Optional[str]): Codec for the value, as in put().
 
         Example:
             >>> kv = KV()
@@ -418,12 +1706,7 @@ class KV:
             >>>
             >>> kv.close()
         """
-        if ttl_seconds:
-            ttl = int((datetime.now() + timedelta(seconds=ttl_seconds)).timestamp())
-        else:
-            ttl = None
-
-        self.cache_values.extend([key, self._encode_value(value), ttl])
+        self.cache_values.append((key, *self._encode_value(key, value, codec), self._expiry(ttl_seconds)))
         self.cache_row_count += 1
 
     def commit_cached(self) -> None:
@@ -431,7 +1714,8 @@ class KV:
         Commit all cached key-value pairs to the database in a single transaction.
 
         Writes all entries added via put_cached() to the database in one
-        efficient bulk operation. After committing, the cache is cleared.
+        transaction, using put_many()'s chunked executemany(), so any number
+        of entries can be cached. After committing, the cache is cleared.
         If no cached entries exist, this method does nothing.
 
         This method is essential for achieving high performance when inserting
@@ -462,13 +1746,115 @@ class KV:
         if not self.cache_values:
             return
 
-        values = ",".join(["(?, ?, ?)" for _ in range(self.cache_row_count)])
+        rows = self.cache_values
+        self.cache_values = []
+        self.cache_row_count = 0
+        self._put_rows(rows)
+
+    def _put_rows(self, rows: Iterable[Tuple[str, Union[str, bytes], int, Optional[int]]]) -> None:
+        written: List[str] = []
+        with self.transaction():
+            for chunk in _chunks(rows):
+                keys = [row[0] for row in chunk]
+                self._supersede(keys)
+                self.cursor.executemany(_INSERT_ROW, chunk)
+                self._written(keys)
+                if _NAMESPACE_LIMITS:
+                    written.extend(keys)
+        if written:
+            self._note_writes(written)
 
-        sql = f"""
-            INSERT OR REPLACE INTO kv (key, value, ttl) VALUES {values}
+    def put_many(
+        self,
+        items: Union[Dict[str, Any], Iterable[Tuple[str, Any]]],
+        ttl_seconds: Optional[int] = None,
+        codec: Optional[str] = None,
+    ) -> None:
         """
+        Store many key-value pairs in a single transaction.
 
-        self.cursor.execute(sql, self.cache_values)
-        self.conn.commit()
-        self.cache_values = []
-        self.cache_row_count = 0
+        Rows are written with executemany() in chunks of KV_BATCH_SIZE, so
+        there is no limit on how many pairs can be stored at once, and all of
+        them become visible together.
+
+        Args:
+            items (Union[Dict[str, Any], Iterable[Tuple[str, Any]]]): A dict or
+                an iterable of (key, value) pairs. Values follow the same rules
+                as put().
+            ttl_seconds (Optional[int]): Time-to-live in seconds applied to
+                every pair. Defaults to None (no expiration).
+            codec (Optional[str]): Codec for every pair, as in put().
+
+        Example:
+            >>> with KV() as kv:
+            ...     kv.put_many({"user:1": {"name": "Alice"}, "user:2": {"name": "Bob"}})
+            ...     kv.put_many(((f"item:{i}", i) for i in range(10000)), ttl_seconds=300)
+        """
+        ttl = self._expiry(ttl_seconds)
+        pairs = items.items() if isinstance(items, dict) else items
+        self._put_rows((key, *self._encode_value(key, value, codec), ttl) for key, value in pairs)
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, Any]:
+        """
+        Retrieve many values at once.
+
+        Looks the keys up with IN (...) queries of at most KV_BATCH_SIZE keys
+        each. Keys that don't exist or have expired are left out of the result.
+
+        Args:
+            keys (Iterable[str]): The keys to look up.
+
+        Returns:
+            Dict[str, Any]: The found keys mapped to their decoded values.
+
+        Example:
+            >>> with KV() as kv:
+            ...     kv.put_many({"user:1": "Alice", "user:2": "Bob"})
+            ...     kv.get_many(["user:1", "user:2", "user:3"])
+            {'user:1': 'Alice', 'user:2': 'Bob'}
+        """
+        now_seconds = int(datetime.now().timestamp())
+        if _PENDING_WRITES:
+            keys = list(keys)
+        result = {}
+        for chunk in _chunks(keys):
+            placeholders = ",".join("?" * len(chunk))
+            rows = self.conn.execute(
+                f"SELECT key, value, codec FROM kv WHERE key IN ({placeholders}) AND (ttl IS NULL OR ttl > ?)",
+                (*chunk, now_seconds),
+            )
+            for key, value, tag in rows:
+                if _stored(value, tag):
+                    result[key] = self._decode_value(value, tag)
+        if _PENDING_WRITES:
+            for key in keys:
+                row = _pending_row(self.path, key)
+                if row is _MISSING:
+                    continue
+                if row is None or (row[2] is not None and row[2] <= now_seconds):
+                    result.pop(key, None)
+                else:
+                    result[key] = self._decode_value(row[0], row[1])
+        if _NAMESPACE_LIMITS:
+            for key in result:
+                _record_access(self.path, key)
+        return result
+
+    def delete_many(self, keys: Iterable[str]) -> None:
+        """
+        Delete many keys in a single transaction.
+
+        Keys that don't exist are ignored.
+
+        Args:
+            keys (Iterable[str]): The keys to delete.
+
+        Example:
+            >>> with KV() as kv:
+            ...     kv.delete_many(["user:1", "user:2"])
+        """
+        with self.transaction():
+            for chunk in _chunks(keys):
+                self._supersede(chunk)
+                self.cursor.executemany("DELETE FROM kv WHERE key = ?", ((key,) for key in chunk))
+                self._written(chunk)
@@ -209,4 +209,4 @@ def delete_all_memoized():
         >>> data3 = get_user_data("user123")  # Fetches from database
     """
     with KV() as kv:
-        kv.delete_partial("memoize")
+        kv.clear_namespace("memoize")
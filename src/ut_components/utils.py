@@ -17,9 +17,27 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 import functools
 import secrets
 import string
-from dataclasses import asdict, is_dataclass
+from dataclasses import fields, is_dataclass
 from enum import Enum
-from typing import Any, Callable
+from typing import Any, Callable, Dict, Tuple, Union
+
+from .enum import Enum as UTEnum
+
+_SCALAR = 0
+_ENUM = 1
+_DICT = 2
+_SEQUENCE = 3
+
+_SERIALIZE_PLANS: Dict[type, Union[int, Tuple[str, ...]]] = {
+    str: _SCALAR,
+    int: _SCALAR,
+    float: _SCALAR,
+    bool: _SCALAR,
+    type(None): _SCALAR,
+    dict: _DICT,
+    list: _SEQUENCE,
+    tuple: _SEQUENCE,
+}
 
 
 def short_string():
@@ -98,6 +116,74 @@ def enum_to_str(obj):
     return obj
 
 
+def _serialize_plan(cls: type) -> Union[int, Tuple[str, ...]]:
+    if issubclass(cls, (Enum, UTEnum)):
+        plan: Union[int, Tuple[str, ...]] = _ENUM
+    elif is_dataclass(cls):
+        plan = tuple(f.name for f in fields(cls))
+    elif issubclass(cls, dict):
+        plan = _DICT
+    elif issubclass(cls, (list, tuple)):
+        plan = _SEQUENCE
+    else:
+        plan = _SCALAR
+    _SERIALIZE_PLANS[cls] = plan
+    return plan
+
+
+def to_qml(obj: Any) -> Any:
+    """
+    Convert a value into plain dicts, lists and scalars in a single pass.
+
+    This is the serializer used to hand data over to QML. Dataclasses become
+    dicts, Enum values (both the standard library ones and the ones from
+    src.ut_components.enum) become their values, and dicts, lists and tuples
+    are walked recursively. Unlike enum_to_str(asdict(obj)), each container is
+    built exactly once and nothing is deep-copied ahead of time.
+
+    The work needed for a given class (which fields a dataclass has, whether
+    it is an Enum, a container or a plain scalar) is computed on first sight
+    and cached, so serializing long lists of the same dataclass only pays an
+    attribute lookup per field.
+
+    Args:
+        obj (Any): The value to convert.
+
+    Returns:
+        Any: A structure made only of dicts, lists and scalars.
+
+    Example:
+        >>> from dataclasses import dataclass
+        >>> from src.ut_components.enum import StrEnum
+        >>> from src.ut_components.utils import to_qml
+        >>>
+        >>> class Color(StrEnum):
+        ...     RED = "red"
+        >>>
+        >>> @dataclass
+        ... class Pen:
+        ...     color: Color
+        ...     sizes: tuple
+        >>>
+        >>> to_qml([Pen(color=Color.RED, sizes=(1, 2))])
+        [{'color': 'red', 'sizes': [1, 2]}]
+    """
+    cls = obj.__class__
+    plan = _SERIALIZE_PLANS.get(cls)
+    if plan is None:
+        plan = _serialize_plan(cls)
+
+    if plan == _SCALAR:
+        return obj
+    elif plan == _ENUM:
+        return obj.value
+    elif plan == _DICT:
+        return {k: to_qml(v) for k, v in obj.items()}
+    elif plan == _SEQUENCE:
+        return [to_qml(item) for item in obj]
+    return {name: to_qml(getattr(obj, name)) for name in plan}  # type: ignore
+
+
 def dataclass_to_dict(func: Callable) -> Callable:
     """
     Decorator to automatically convert dataclass return values to dictionaries.
@@ -108,8 +194,9 @@ def dataclass_to_dict(func: Callable) -> Callable:
     making the data readily consumable by QML components without manual conversion.
 
     The decorator checks if the function's return value is a dataclass instance.
-    If it is, it converts it to a dictionary and processes any Enum values to
-    their string representations. Non-dataclass return values pass through unchanged.
+    If it is, it converts it to a dictionary with to_qml(), which also turns any
+    Enum values into their string representations. Non-dataclass return values
+    pass through unchanged.
 
     Args:
         func (Callable): The function to be decorated. Should return either a
@@ -165,7 +252,7 @@ def dataclass_to_dict(func: Callable) -> Callable:
     def wrapper(*args, **kwargs) -> Any:
         response = func(*args, **kwargs)
         if is_dataclass(response):
-            return enum_to_str(asdict(response))  # type: ignore
+            return to_qml(response)
         else:
             return response
 
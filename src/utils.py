@@ -24,13 +24,16 @@ setup(APP_NAME, CRASH_REPORT_URL)
 
 import json
 import os
+import re
 import subprocess
 from dataclasses import dataclass
 from datetime import datetime
-from typing import Dict, List, Optional
+from typing import Dict, Iterable, List, Optional
 
 from src.ut_components.config import get_app_data_path, get_config_path
 
+SEARCH_TOKEN_PATTERN = re.compile(r"\w+")
+
 
 def run_subprocess(args: List[str], env: Optional[Dict[str, str]] = None):
     return subprocess.run(args=args, check=False, text=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT, env=env)
@@ -61,3 +64,12 @@ def parse_bw_date(dt: str) -> str:
     if not dt:
         return ""
     return datetime.fromisoformat(dt.replace("Z", "")).strftime("%B %d, %Y. %H:%M")
+
+
+def search_tokens(text: str) -> List[str]:
+    return SEARCH_TOKEN_PATTERN.findall(text.lower())
+
+
+def matches_tokens(query_tokens: Iterable[str], tokens: List[str]) -> bool:
+    # Every query token must be the start of some token, so "git ex" finds "GitHub example".
+    return all(any(token.startswith(query_token) for token in tokens) for query_token in query_tokens)
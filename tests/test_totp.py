@@ -0,0 +1,188 @@
+"""
+Copyright (C) 2025  Brenno Flávio de Almeida
+
+This program is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; version 3.
+
+sealed is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import base64
+import hashlib
+import unittest
+
+from src.totp import (
+    TotpParams,
+    clear_totp_cache,
+    generate_code,
+    generate_codes,
+    generate_hotp,
+    generate_steam_code,
+    get_totp_window,
+    parse_totp_secret,
+)
+
+RFC4226_SECRET = b"12345678901234567890"
+
+# RFC 4226 appendix D: HOTP values for counters 0-9
+RFC4226_CODES = [
+    "755224",
+    "287082",
+    "359152",
+    "969429",
+    "338314",
+    "254676",
+    "287922",
+    "162583",
+    "399871",
+    "520489",
+]
+
+# RFC 6238 appendix B: 8-digit TOTP values, 30 second period
+RFC6238_SECRETS = {
+    "SHA1": b"12345678901234567890",
+    "SHA256": b"12345678901234567890123456789012",
+    "SHA512": b"1234567890123456789012345678901234567890123456789012345678901234",
+}
+RFC6238_CODES = [
+    (59, {"SHA1": "94287082", "SHA256": "46119246", "SHA512": "90693936"}),
+    (1111111109, {"SHA1": "07081804", "SHA256": "68084774", "SHA512": "25091201"}),
+    (1111111111, {"SHA1": "14050471", "SHA256": "67062674", "SHA512": "99943326"}),
+    (1234567890, {"SHA1": "89005924", "SHA256": "91819424", "SHA512": "93441116"}),
+    (2000000000, {"SHA1": "69279037", "SHA256": "90698825", "SHA512": "38618901"}),
+    (20000000000, {"SHA1": "65353130", "SHA256": "77737706", "SHA512": "47863826"}),
+]
+
+# The RFC 4226 truncated values for counters 0-2 (1284755224, 1094287082,
+# 137359152) written with Steam's 26 character alphabet, least significant first
+STEAM_CODES = ["GG5F5", "PV9M4", "B26KJ"]
+
+
+def b32(secret):
+    return base64.b32encode(secret).decode("ascii")
+
+
+class TotpTestCase(unittest.TestCase):
+    def setUp(self):
+        clear_totp_cache()
+
+
+class TestRfc4226(TotpTestCase):
+    def test_generate_hotp(self):
+        for counter, expected in enumerate(RFC4226_CODES):
+            self.assertEqual(generate_hotp(RFC4226_SECRET, counter), expected)
+
+    def test_generate_codes(self):
+        params = TotpParams(secret=RFC4226_SECRET)
+        self.assertEqual(generate_codes(params, 0, 10), RFC4226_CODES)
+        self.assertEqual(generate_codes(params, 4, 3), RFC4226_CODES[4:7])
+
+    def test_generate_code(self):
+        params = parse_totp_secret(b32(RFC4226_SECRET))
+        for counter, expected in enumerate(RFC4226_CODES):
+            self.assertEqual(generate_code(params, counter), expected)
+
+
+class TestRfc6238(TotpTestCase):
+    def test_generate_code(self):
+        for now, codes in RFC6238_CODES:
+            for algorithm, expected in codes.items():
+                with self.subTest(now=now, algorithm=algorithm):
+                    params = TotpParams(secret=RFC6238_SECRETS[algorithm], digits=8, algorithm=algorithm)
+                    self.assertEqual(generate_code(params, now // 30), expected)
+
+    def test_generate_hotp_digest(self):
+        digests = {"SHA1": hashlib.sha1, "SHA256": hashlib.sha256, "SHA512": hashlib.sha512}
+        for now, codes in RFC6238_CODES:
+            for algorithm, expected in codes.items():
+                with self.subTest(now=now, algorithm=algorithm):
+                    code = generate_hotp(RFC6238_SECRETS[algorithm], now // 30, 8, digests[algorithm])
+                    self.assertEqual(code, expected)
+
+    def test_get_totp_window(self):
+        for algorithm, secret in RFC6238_SECRETS.items():
+            uri = f"otpauth://totp/Example:alice?secret={b32(secret)}&algorithm={algorithm}&digits=8"
+            for now, codes in RFC6238_CODES:
+                with self.subTest(now=now, algorithm=algorithm):
+                    params, code, _, seconds_remaining = get_totp_window(uri, now=now)
+                    self.assertEqual(params.algorithm, algorithm)
+                    self.assertEqual(code, codes[algorithm])
+                    self.assertEqual(seconds_remaining, 30 - now % 30)
+
+    def test_next_code(self):
+        # 1111111109 and 1111111111 fall in consecutive periods
+        secret = RFC6238_SECRETS["SHA1"]
+        _, code, next_code, seconds_remaining = get_totp_window(
+            f"otpauth://totp/a?secret={b32(secret)}&digits=8", now=1111111109
+        )
+        self.assertEqual((code, next_code, seconds_remaining), ("07081804", "14050471", 1))
+
+
+class TestSteam(TotpTestCase):
+    def test_generate_steam_code(self):
+        for counter, expected in enumerate(STEAM_CODES):
+            self.assertEqual(generate_steam_code(RFC4226_SECRET, counter), expected)
+
+    def test_steam_uri(self):
+        params = parse_totp_secret(f"steam://{b32(RFC4226_SECRET)}")
+        self.assertEqual(params, TotpParams(secret=RFC4226_SECRET, digits=5, steam=True))
+        self.assertEqual(generate_codes(params, 0, 3), STEAM_CODES)
+
+    def test_otpauth_steam(self):
+        secret = b32(RFC4226_SECRET)
+        for uri in (
+            f"otpauth://totp/Steam:alice?secret={secret}&issuer=Steam",
+            f"otpauth://totp/Steam:alice?secret={secret}",
+            f"otpauth://totp/alice?secret={secret}&encoder=steam",
+        ):
+            with self.subTest(uri=uri):
+                params = parse_totp_secret(uri)
+                self.assertTrue(params.steam)
+                self.assertEqual(params.digits, 5)
+                self.assertEqual(generate_code(params, 1), STEAM_CODES[1])
+
+
+class TestParse(TotpTestCase):
+    def test_plain_secret(self):
+        self.assertEqual(parse_totp_secret(b32(RFC4226_SECRET)), TotpParams(secret=RFC4226_SECRET))
+
+    def test_plain_secret_formatting(self):
+        # lowercase, grouped and unpadded, as secrets are often shown
+        secret = b32(b"hello!").rstrip("=").lower()
+        groups = [secret[i : i + 4] for i in range(0, len(secret), 4)]
+        self.assertEqual(parse_totp_secret(f"  {' '.join(groups)}  ").secret, b"hello!")
+        self.assertEqual(parse_totp_secret("-".join(groups)).secret, b"hello!")
+
+    def test_otpauth_defaults(self):
+        params = parse_totp_secret(f"otpauth://totp/Example:alice@example.com?secret={b32(RFC4226_SECRET)}")
+        self.assertEqual(params, TotpParams(secret=RFC4226_SECRET))
+
+    def test_otpauth_parameters(self):
+        params = parse_totp_secret(
+            f"OTPAUTH://TOTP/Example:alice?secret={b32(RFC4226_SECRET)}&algorithm=sha512&digits=8&period=60"
+        )
+        self.assertEqual(params, TotpParams(secret=RFC4226_SECRET, period=60, digits=8, algorithm="SHA512"))
+
+    def test_otpauth_errors(self):
+        secret = b32(RFC4226_SECRET)
+        for uri in (
+            f"otpauth://hotp/a?secret={secret}&counter=0",
+            "otpauth://totp/a?issuer=Example",
+            f"otpauth://totp/a?secret={secret}&algorithm=MD5",
+            f"otpauth://totp/a?secret={secret}&digits=0",
+            f"otpauth://totp/a?secret={secret}&period=-30",
+        ):
+            with self.subTest(uri=uri):
+                with self.assertRaises(ValueError):
+                    parse_totp_secret(uri)
+
+
+if __name__ == "__main__":
+    unittest.main()